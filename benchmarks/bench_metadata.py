@@ -0,0 +1,56 @@
+"""
+Benchmark the overhead of per-image metadata accessed in every batch.
+
+Reads the rotations, offsets, amplitudes and filter indices of each
+batch of a `Simulation`, the way `im_backward`, `vol_forward` and
+`MeanEstimator.compute_kernel` do, with and without the arrays being
+kept between batches.
+
+Usage:
+    python benchmarks/bench_metadata.py --n 100000 --batch-size 512
+"""
+import argparse
+
+from utils import timeit
+
+from aspire.operators import RadialCTFFilter
+from aspire.source import Simulation
+
+
+def read_batches(src, batch_size, keep):
+    for start in range(0, src.n, batch_size):
+        if not keep:
+            # What every access cost before hot metadata was kept as arrays
+            src._hot.clear()
+        idx = slice(start, start + batch_size)
+        src.rots[idx]
+        src.offsets[idx]
+        src.amplitudes[idx]
+        src.filter_indices[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    src = Simulation(
+        L=8,
+        n=args.n,
+        unique_filters=[RadialCTFFilter(defocus=d) for d in (1.5e4, 2e4, 2.5e4)],
+        dtype="single",
+    )
+    n_batches = -(-args.n // args.batch_size)
+
+    for keep in (False, True):
+        t = timeit(read_batches, src, args.batch_size, keep, repeat=args.repeat)
+        print(
+            f"{'kept' if keep else 'looked up':>9}: {t:8.3f} s"
+            f"  {1e6 * t / n_batches:10.1f} us/batch"
+        )
+
+
+if __name__ == "__main__":
+    main()
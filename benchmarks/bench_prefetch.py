@@ -0,0 +1,51 @@
+"""
+Benchmark overlap of image loading and compute with `ImageSource.iter_batches`.
+
+Runs an `AnisotropicNoiseEstimator` over a phase flipped, downsampled
+`RelionSource` built from synthetic .mrcs stacks, with prefetching
+disabled and enabled.
+
+Usage:
+    python benchmarks/bench_prefetch.py --n 8192 --L 128
+"""
+import argparse
+import tempfile
+
+from utils import make_relion_dataset, timeit
+
+from aspire.config import config_override
+from aspire.noise import AnisotropicNoiseEstimator
+from aspire.source import RelionSource
+
+
+def estimate(src, batch_size):
+    AnisotropicNoiseEstimator(src, batchSize=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n", type=int, default=4096)
+    parser.add_argument("--L", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = make_relion_dataset(tmpdir, n=args.n, L=args.L)
+        src = RelionSource(filepath)
+        src.phase_flip()
+        src.downsample(args.L // 2)
+
+        for prefetch, workers in ((0, 1), (1, 1), (2, 2)):
+            with config_override(
+                {"source.prefetch": prefetch, "source.prefetch_workers": workers}
+            ):
+                t = timeit(estimate, src, args.batch_size, repeat=args.repeat)
+            print(
+                f"prefetch={prefetch} workers={workers}: {t:8.3f} s"
+                f"  {args.n / t:10.0f} images/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
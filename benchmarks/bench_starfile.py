@@ -0,0 +1,138 @@
+"""
+Benchmark STAR file parsing and writing throughput (rows/s).
+
+Compares the bulk `StarFile` loop parser against a line-by-line reference
+tokenizer, and `StarFile.save` against a row-by-row `iterrows` writer,
+equivalent to what `StarFile` used previously, on a synthetic particle
+STAR file.
+
+Usage:
+    python benchmarks/bench_starfile.py --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from utils import timeit
+
+from aspire.source import RelionSource
+from aspire.storage import StarFile, StarFileBlock
+
+FIELDS = [
+    "_rlnCoordinateX",
+    "_rlnCoordinateY",
+    "_rlnImageName",
+    "_rlnMicrographName",
+    "_rlnVoltage",
+    "_rlnDefocusU",
+    "_rlnDefocusV",
+    "_rlnDefocusAngle",
+    "_rlnSphericalAberration",
+    "_rlnAmplitudeContrast",
+    "_rlnAngleRot",
+    "_rlnAngleTilt",
+    "_rlnAnglePsi",
+    "_rlnOriginX",
+    "_rlnOriginY",
+    "_rlnClassNumber",
+]
+
+
+def write_starfile(filepath, n_rows, seed=0):
+    rng = np.random.RandomState(seed)
+    with open(filepath, "w") as f:
+        f.write("data_\n\nloop_\n")
+        for i, field in enumerate(FIELDS):
+            f.write(f"{field} #{i + 1}\n")
+        chunk = 100000
+        for start in range(0, n_rows, chunk):
+            m = min(chunk, n_rows - start)
+            idx = np.arange(start, start + m)
+            values = rng.uniform(0, 4096, size=(m, 12))
+            lines = (
+                f"{v[0]:.6f} {v[1]:.6f} {i % 1000 + 1:06d}@stack_{i // 1000}.mrcs "
+                f"mic_{i // 1000}.mrc 300.0 {v[2] * 5:.6f} {v[3] * 5:.6f} {v[4] / 12:.6f} "
+                f"2.7 0.1 {v[5] / 12:.6f} {v[6] / 24:.6f} {v[7] / 12:.6f} "
+                f"{v[8] / 400:.6f} {v[9] / 400:.6f} {i % 4 + 1}\n"
+                for i, v in zip(idx, values)
+            )
+            f.writelines(lines)
+
+
+def reference_parse(filepath):
+    """
+    Line-by-line tokenizer building a string DataFrame, followed by a cast.
+    """
+    field_names = []
+    rows = []
+    with open(filepath, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(("#", "data_", "loop_")):
+                continue
+            if line.startswith("_"):
+                field_names.append(line.split()[0])
+            else:
+                rows.append(line.split()[: len(field_names)])
+    df = pd.DataFrame(rows, columns=field_names, dtype=str)
+    column_types = {
+        name: RelionSource.metadata_fields.get(name, str) for name in df.columns
+    }
+    return df.astype(column_types)
+
+
+def reference_save(df, filepath):
+    with open(filepath, "w") as f:
+        f.write("data_\n\nloop_\n")
+        for col in df.columns:
+            f.write(f"{col}\n")
+        for _, row in df.iterrows():
+            f.write(" ".join(map(str, row)) + "\n")
+
+
+def bulk_save(df, filepath, float_precision=None):
+    with open(filepath, "w") as f:
+        StarFile(blocks=[StarFileBlock(loops=[df])]).save(
+            f, float_precision=float_precision
+        )
+
+
+def bulk_parse(filepath):
+    return StarFile(filepath, column_types=RelionSource.metadata_fields)[0][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "particles.star")
+        write_starfile(filepath, args.rows)
+
+        df_ref = reference_parse(filepath)
+        df_bulk = bulk_parse(filepath)
+        assert df_ref.shape == df_bulk.shape
+        assert np.allclose(df_ref["_rlnDefocusU"], df_bulk["_rlnDefocusU"])
+
+        print("Parsing")
+        for name, fn in (("reference", reference_parse), ("bulk", bulk_parse)):
+            t = timeit(fn, filepath, repeat=args.repeat)
+            print(f"{name:>18}: {t:8.3f} s  {args.rows / t:12.0f} rows/s")
+
+        print("Writing")
+        out_filepath = os.path.join(tmpdir, "out.star")
+        for name, fn, fn_args in (
+            ("reference", reference_save, ()),
+            ("bulk", bulk_save, ()),
+            ("bulk (6 decimals)", bulk_save, (6,)),
+        ):
+            t = timeit(fn, df_bulk, out_filepath, *fn_args, repeat=args.repeat)
+            print(f"{name:>18}: {t:8.3f} s  {args.rows / t:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Time the core kernels on synthetic data, and compare against a stored baseline.
+
+Covers non-uniform FFTs (each available backend, both precisions, 2D and
+3D), `FFBBasis2D`/`FFBBasis3D` evaluate and evaluate_t, common-lines
+matrices, `BatchedRotCov2D` mean and covariance, the `MeanEstimator`
+kernel and conjugate gradient, and the APPLE picker's query scores.
+Every case is timed as the best of `--repeat` runs after one warm-up run.
+
+Results are written as JSON with `--output`. With `--compare`, times are
+compared with those of a baseline written earlier with the same sizes;
+cases slower than the baseline by more than `--threshold` are listed as
+regressions, and the script exits with status 1 if there are any.
+
+Usage:
+    python benchmarks/bench_suite.py --output baseline.json
+    python benchmarks/bench_suite.py --compare baseline.json --threshold 0.2
+    python benchmarks/bench_suite.py --only nufft ffb2d --L 64
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+import mrcfile
+import numpy as np
+from utils import timeit
+
+import aspire
+from aspire import config
+from aspire.abinitio import CLOrient3D
+from aspire.apple.picking import Picker
+from aspire.basis import FBBasis3D, FFBBasis2D, FFBBasis3D
+from aspire.covariance import BatchedRotCov2D
+from aspire.nufft import Plan, all_backends
+from aspire.operators import RadialCTFFilter
+from aspire.reconstruction import MeanEstimator
+from aspire.source import Simulation
+from aspire.utils.types import complex_type
+
+DTYPES = (np.float32, np.float64)
+
+
+def simulation(L, n, dtype):
+    # Every CTF group gets images, which the covariance estimator requires
+    num_filters = min(7, n)
+    return Simulation(
+        L=L,
+        n=n,
+        unique_filters=[
+            RadialCTFFilter(defocus=d) for d in np.linspace(1.5e4, 2.5e4, num_filters)
+        ],
+        filter_indices=np.arange(n) % num_filters,
+        dtype=dtype,
+        seed=0,
+    )
+
+
+def nufft_cases(args):
+    """
+    Adjoint and forward transforms at random points, on plans built once, and plan building itself.
+    """
+    rng = np.random.RandomState(0)
+    for backend in all_backends():
+        for dtype in DTYPES:
+            for dim in (2, 3):
+                sz = (args.L,) * dim
+                num_pts = args.n * args.L ** 2 if dim == 2 else 4 * args.L ** 3
+                pts = rng.uniform(-np.pi, np.pi, (dim, num_pts)).astype(dtype)
+                sig_f = rng.randn(num_pts).astype(complex_type(dtype))
+                sig = rng.randn(*sz).astype(complex_type(dtype))
+
+                def plan(pts=pts, sz=sz, backend=backend):
+                    return Plan(sz, pts, backend=backend)
+
+                name = f"nufft.{backend}.{dim}d.{np.dtype(dtype).name}"
+                yield f"{name}.plan", plan, num_pts
+                yield f"{name}.adjoint", plan().adjoint, num_pts, sig_f
+                yield f"{name}.transform", plan().transform, num_pts, sig
+
+
+def ffb2d_cases(args):
+    for dtype in DTYPES:
+        basis = FFBBasis2D((args.L, args.L), dtype=dtype)
+        im = simulation(args.L, args.n, dtype).images(0, args.n)
+        coeffs = basis.evaluate_t(im)
+
+        name = f"ffb2d.{np.dtype(dtype).name}"
+        yield f"{name}.evaluate", basis.evaluate, args.n, coeffs
+        yield f"{name}.evaluate_t", basis.evaluate_t, args.n, im
+
+
+def ffb3d_cases(args):
+    for dtype in DTYPES:
+        basis = FFBBasis3D((args.L,) * 3, dtype=dtype)
+        vol = np.random.RandomState(0).randn(*basis.sz).astype(dtype)
+        coeffs = basis.evaluate_t(vol)
+
+        name = f"ffb3d.{np.dtype(dtype).name}"
+        yield f"{name}.evaluate", basis.evaluate, 1, coeffs
+        yield f"{name}.evaluate_t", basis.evaluate_t, 1, vol
+
+
+def clmatrix_cases(args):
+    src = simulation(args.L, args.n, np.float32)
+    orient_est = CLOrient3D(src, n_rad=args.L // 2, n_theta=36)
+
+    # Rates are of pairs of images searched
+    yield "clmatrix.float32", orient_est.build_clmatrix, args.n * (args.n - 1) // 2
+
+
+def cov2d_cases(args):
+    src = simulation(args.L, args.n, np.float32)
+    basis = FFBBasis2D((args.L, args.L), dtype=np.float32)
+
+    def mean_covar():
+        # A new object, since right-hand sides and operators are kept once computed
+        cov2d = BatchedRotCov2D(src, basis)
+        cov2d.get_covar(mean_coeff=cov2d.get_mean())
+
+    yield "cov2d.float32.mean_covar", mean_covar, args.n
+
+
+def mean_cases(args):
+    # The dense FBBasis3D makes each iteration of conjugate gradient costly beyond small sizes
+    L = min(args.L, 8)
+    src = simulation(L, args.n, np.float32)
+    estimator = MeanEstimator(
+        src, FBBasis3D((L,) * 3, dtype=np.float32), preconditioner="none"
+    )
+    b_coeff = estimator.src_backward()
+
+    yield "mean.float32.kernel", estimator.compute_kernel, args.n
+    yield "mean.float32.conj_grad", estimator.conj_grad, 1, b_coeff
+
+
+def apple_cases(args):
+    margins = (
+        config.apple.mrc_margin_top + config.apple.mrc_margin_bottom,
+        config.apple.mrc_margin_left + config.apple.mrc_margin_right,
+    )
+    shape = tuple(args.micrograph_size + m for m in margins)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, "micrograph.mrc")
+        with mrcfile.new(filepath) as mrc:
+            mrc.set_data(np.random.RandomState(0).randn(*shape).astype(np.float32))
+
+        picker = Picker(
+            config.apple.particle_size,
+            config.apple.max_particle_size,
+            config.apple.min_particle_size,
+            config.apple.query_image_size,
+            config.apple.tau1,
+            config.apple.tau2,
+            config.apple.minimum_overlap_amount,
+            config.apple.container_size,
+            filepath,
+            tmpdir,
+        )
+
+    # Reference windows are drawn from containers, so at least one must fit in the micrograph
+    if min(picker.im.shape) < picker.container_size:
+        print(
+            f"Skipping apple: --micrograph-size {args.micrograph_size} is smaller"
+            f" than the container size {config.apple.container_size}"
+        )
+        return
+
+    yield "apple.query_score", picker.query_score, 1, False
+
+
+CASES = {
+    "nufft": nufft_cases,
+    "ffb2d": ffb2d_cases,
+    "ffb3d": ffb3d_cases,
+    "clmatrix": clmatrix_cases,
+    "cov2d": cov2d_cases,
+    "mean": mean_cases,
+    "apple": apple_cases,
+}
+
+
+def run(args):
+    """
+    Time every case of the selected groups.
+
+    A failing case is recorded with its `error` and does not stop the others;
+    a group failing while setting up its cases is recorded under the group name.
+
+    :return: A dict of results by case name, each with `seconds` and `per_second`, or `error`.
+    """
+    results = {}
+    for group in args.only or CASES:
+        cases = CASES[group](args)
+        while True:
+            name = group
+            try:
+                name, fn, count, *fn_args = next(cases)
+                fn(*fn_args)
+                seconds = timeit(fn, *fn_args, repeat=args.repeat)
+            except StopIteration:
+                break
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"{name:40s} failed: {results[name]['error']}")
+                sys.stdout.flush()
+                # A generator which raised is finished, a case which raised is not
+                if name == group:
+                    break
+                continue
+            results[name] = {"seconds": seconds, "per_second": count / seconds}
+            print(f"{name:40s} {seconds:10.4f} s {count / seconds:14.1f} /s")
+            sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the ratio of each case's time to its baseline.
+
+    :return: The names of cases slower than the baseline by more than `threshold`.
+    """
+    regressions = []
+    print(f"\n{'case':40s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:40s} {'':>10s} {'failed':>10s}")
+            continue
+        if name not in baseline or "error" in baseline[name]:
+            print(f"{name:40s} {'-':>10s} {result['seconds']:10.4f}")
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:40s} {baseline[name]['seconds']:10.4f}"
+            f" {result['seconds']:10.4f} {ratio:7.2f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", nargs="+", choices=list(CASES))
+    parser.add_argument("--L", type=int, default=32)
+    parser.add_argument("--n", type=int, default=256)
+    parser.add_argument("--micrograph-size", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Path of a JSON file to write results to")
+    parser.add_argument("--compare", help="Path of a JSON file of baseline results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown beyond which a case is a regression",
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "aspire": aspire.__version__,
+                        "numpy": np.__version__,
+                        "python": platform.python_version(),
+                        "machine": platform.machine(),
+                        "cpus": os.cpu_count(),
+                        "nfft_backends": all_backends(),
+                        "args": vars(args),
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for size in ("L", "n", "micrograph_size"):
+            if baseline["meta"]["args"][size] != getattr(args, size):
+                print(f"Warning: baseline was run with a different --{size}")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
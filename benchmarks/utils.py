@@ -0,0 +1,69 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import os
+import time
+
+import mrcfile
+import numpy as np
+
+
+def make_relion_dataset(dirname, n=4096, L=128, per_stack=512, seed=0):
+    """
+    Write a synthetic particle STAR file with its .mrcs stacks.
+
+    :param dirname: Directory in which to write the files.
+    :param n: Number of particles.
+    :param L: Image size.
+    :param per_stack: Number of images per .mrcs stack.
+    :param seed: Random seed.
+    :return: Path to the STAR file.
+    """
+    rng = np.random.RandomState(seed)
+    lines = []
+    for k, start in enumerate(range(0, n, per_stack)):
+        m = min(per_stack, n - start)
+        fname = f"stack_{k}.mrcs"
+        with mrcfile.new_mmap(
+            os.path.join(dirname, fname), shape=(m, L, L), mrc_mode=2
+        ) as mrc:
+            mrc.data[:] = rng.randn(m, L, L).astype(np.float32)
+        for j in range(m):
+            defocus = rng.uniform(1e4, 3e4)
+            lines.append(
+                f"{j + 1:06d}@{fname} 300.0 {defocus:.2f} {defocus:.2f} 0.0 2.0 0.1"
+                f" {rng.uniform(0, 360):.4f} {rng.uniform(0, 180):.4f}"
+                f" {rng.uniform(0, 360):.4f}"
+            )
+
+    filepath = os.path.join(dirname, "particles.star")
+    with open(filepath, "w") as f:
+        f.write("data_\n\nloop_\n")
+        for field in (
+            "_rlnImageName",
+            "_rlnVoltage",
+            "_rlnDefocusU",
+            "_rlnDefocusV",
+            "_rlnDefocusAngle",
+            "_rlnSphericalAberration",
+            "_rlnAmplitudeContrast",
+            "_rlnAngleRot",
+            "_rlnAngleTilt",
+            "_rlnAnglePsi",
+        ):
+            f.write(f"{field}\n")
+        f.write("\n".join(lines) + "\n\n")
+
+    return filepath
+
+
+def timeit(fn, *args, repeat=3, **kwargs):
+    """
+    Best wall clock time of `repeat` calls to `fn`.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - tic)
+    return best
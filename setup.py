@@ -26,7 +26,6 @@ setup(
         "click",
         "finufft",
         "importlib_resources>=1.0.2",
-        "joblib",
         "matplotlib",
         "mrcfile",
         "numpy==1.16",
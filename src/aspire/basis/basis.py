@@ -1,4 +1,5 @@
 import logging
+import uuid
 
 import numpy as np
 from scipy.sparse.linalg import LinearOperator, cg
@@ -42,6 +43,9 @@ class Basis:
             raise NotImplementedError(
                 "Currently only implemented for float32 and float64 types"
             )
+        # With the name of the calling method, identifies the (fixed) Fourier points of this basis
+        # to the NUFFT plan cache; methods may arrange the same points in different orders
+        self._nufft_key = uuid.uuid4().hex
 
         self._build()
 
@@ -181,7 +181,14 @@ class FFBBasis2D(FBBasis2D):
         # perform inverse non-uniformly FFT transform back to 2D coordinate basis
         freqs = m_reshape(self._precomp["freqs"], (2, n_r * n_theta))
 
-        x = 2 * anufft(pf, 2 * pi * freqs, self.sz, real=True)
+        x = 2 * anufft(
+            pf,
+            2 * pi * freqs,
+            self.sz,
+            real=True,
+            key=(self._nufft_key, "evaluate"),
+            site="basis",
+        )
 
         # Return X as Image instance with the last two dimensions as *self.sz
         x = x.reshape((*sz_roll, *self.sz))
@@ -222,7 +229,9 @@ class FFBBasis2D(FBBasis2D):
         x_data = x.data
 
         # resamping x in a polar Fourier gird using nonuniform discrete Fourier transform
-        pf = nufft(x_data, 2 * pi * freqs)
+        pf = nufft(
+            x_data, 2 * pi * freqs, key=(self._nufft_key, "evaluate_t"), site="basis"
+        )
         pf = np.reshape(pf, (n_images, n_r, n_theta))
 
         # Recover "negative" frequencies from "positive" half plane.
@@ -378,7 +378,12 @@ class FPSWFBasis2D(PSWFBasis2D):
 
         images_nufft = np.zeros((m, num_images), dtype=complex_type(self.dtype))
         for i in range(start, finish):
-            images_nufft[:, i - start] = nufft(images[..., i], 2 * pi * x.T)
+            images_nufft[:, i - start] = nufft(
+                images[..., i],
+                2 * pi * x.T,
+                key=(self._nufft_key, "nfft"),
+                site="basis",
+            )
 
         return images_nufft
 
@@ -100,7 +100,14 @@ class PolarBasis2D(Basis):
 
         v = v.reshape(nimgs, self.nrad * half_size)
 
-        x = anufft(v, self.freqs, self.sz, real=True)
+        x = anufft(
+            v,
+            self.freqs,
+            self.sz,
+            real=True,
+            key=(self._nufft_key, "evaluate"),
+            site="basis",
+        )
 
         return Image(x)
 
@@ -129,7 +136,9 @@ class PolarBasis2D(Basis):
 
         half_size = self.ntheta // 2
 
-        pf = nufft(x.asnumpy(), self.freqs)
+        pf = nufft(
+            x.asnumpy(), self.freqs, key=(self._nufft_key, "evaluate_t"), site="basis"
+        )
 
         pf = pf.reshape((nimgs, self.nrad, half_size))
         v = np.concatenate((pf, pf.conj()), axis=1)
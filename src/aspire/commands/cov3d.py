@@ -32,7 +32,27 @@ logger = logging.getLogger(__name__)
     help="Resolution of downsampled images read from starfile",
 )
 @click.option("--cg_tol", default=1e-5, help="Tolerance for optimization convergence")
-def cov3d(starfile, data_folder, pixel_size, max_rows, max_resolution, cg_tol):
+@click.option(
+    "--cache",
+    default=None,
+    type=click.Choice(["memory", "disk"]),
+    help="Keep preprocessed images in memory or in a memory-mapped scratch file",
+)
+@click.option(
+    "--scratch_dir",
+    default=None,
+    help="Directory for the scratch file of a disk cache",
+)
+def cov3d(
+    starfile,
+    data_folder,
+    pixel_size,
+    max_rows,
+    max_resolution,
+    cg_tol,
+    cache,
+    scratch_dir,
+):
     """Estimate mean volume and covariance from a starfile."""
 
     source = RelionSource(
@@ -40,7 +60,7 @@ def cov3d(starfile, data_folder, pixel_size, max_rows, max_resolution, cg_tol):
     )
 
     source.downsample(max_resolution)
-    source.cache()
+    source.cache(mode=cache, scratch_dir=scratch_dir)
 
     source.whiten()
     basis = FBBasis3D((max_resolution, max_resolution, max_resolution))
@@ -46,6 +46,17 @@ logger = logging.getLogger(__name__)
     type=str,
     help="Specified method for denoising 2D images",
 )
+@click.option(
+    "--cache",
+    default=None,
+    type=click.Choice(["memory", "disk"]),
+    help="Keep preprocessed images in memory or in a memory-mapped scratch file",
+)
+@click.option(
+    "--scratch_dir",
+    default=None,
+    help="Directory for the scratch file of a disk cache",
+)
 def denoise(
     data_folder,
     starfile_in,
@@ -55,6 +66,8 @@ def denoise(
     max_resolution,
     noise_type,
     denoise_method,
+    cache,
+    scratch_dir,
 ):
     """
     Denoise the images and output the clean images using the default CWF method.
@@ -69,7 +82,7 @@ def denoise(
     if max_resolution < source.L:
         # Downsample the images
         source.downsample(max_resolution)
-    source.cache()
+    source.cache(mode=cache, scratch_dir=scratch_dir)
 
     # Specify the fast FB basis method for expending the 2D images
     basis = FFBBasis2D((max_resolution, max_resolution))
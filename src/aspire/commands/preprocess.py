@@ -2,7 +2,10 @@ import logging
 
 import click
 
+from aspire.image import Image
 from aspire.noise import WhiteNoiseEstimator
+from aspire.operators import PowerFilter
+from aspire.source import MeanImage
 from aspire.source.relion import RelionSource
 
 logger = logging.getLogger(__name__)
@@ -60,6 +63,17 @@ logger = logging.getLogger(__name__)
     default=False,
     help="Whether to overwrite MRC files if they already exist",
 )
+@click.option(
+    "--dtype",
+    default="float32",
+    type=click.Choice(["float32", "float16"]),
+    help="Data type of the saved images. float16 halves the size of the MRC files",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Skip images already saved by an earlier, interrupted run with the same arguments",
+)
 def preprocess(
     data_folder,
     starfile_in,
@@ -74,6 +88,8 @@ def preprocess(
     batch_size,
     save_mode,
     overwrite,
+    dtype,
+    resume,
 ):
     """
     Preprocess the raw images and output desired images for future analysis
@@ -96,15 +112,37 @@ def preprocess(
         logger.info("Normalize images to noise background")
         source.normalize_background()
 
+    # Gather the statistics for whitening and contrast inversion in one pass over the images
+    accumulators = {}
+    if whiten_noise:
+        accumulators["noise"] = WhiteNoiseEstimator.make_accumulator(source)
+    if invert_contrast:
+        accumulators["mean"] = MeanImage(source.L)
+    if accumulators:
+        logger.info("Accumulate image statistics")
+        source.accumulate(accumulators.values(), batch_size=batch_size)
+
     if whiten_noise:
         logger.info("Whiten noise of images")
-        noise_estimator = WhiteNoiseEstimator(source)
+        noise_estimator = WhiteNoiseEstimator(
+            source, batchSize=batch_size, accumulator=accumulators["noise"]
+        )
         source.whiten(noise_estimator.filter)
 
     if invert_contrast:
         logger.info("Invert global density contrast")
-        source.invert_contrast()
+        mean_image = accumulators["mean"].mean
+        if whiten_noise:
+            # Whitening is a linear filter, so the mean of whitened images is the whitened mean image
+            whiten_filter = PowerFilter(noise_estimator.filter, power=-0.5)
+            mean_image = Image(mean_image).filter(whiten_filter).asnumpy()[0]
+        source.invert_contrast(mean_image=mean_image)
 
     source.save(
-        starfile_out, batch_size=batch_size, save_mode=save_mode, overwrite=overwrite
+        starfile_out,
+        batch_size=batch_size,
+        save_mode=save_mode,
+        overwrite=overwrite,
+        resume=resume,
+        dtype=dtype,
     )
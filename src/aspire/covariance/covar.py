@@ -67,7 +67,13 @@ class CovarianceEstimator(Estimator):
             factors = np.zeros((batch_n, _2L, _2L, _2L), dtype=self.dtype)
 
             for j in range(batch_n):
-                factors[j] = anufft(weights[j], pts_rot[j], (_2L, _2L, _2L), real=True)
+                factors[j] = anufft(
+                    weights[j],
+                    pts_rot[j],
+                    (_2L, _2L, _2L),
+                    real=True,
+                    site="reconstruction",
+                )
 
             factors = Volume(factors).to_vec()
             kernel += vecmat_to_volmat(factors.T @ factors) / (n * L ** 8)
@@ -171,8 +177,10 @@ class CovarianceEstimator(Estimator):
             (self.L, self.L, self.L, self.L, self.L, self.L), dtype=self.dtype
         )
 
-        for i in range(0, self.n, self.batch_size):
-            im = self.src.images(i, self.batch_size)
+        for i, im in zip(
+            range(0, self.n, self.batch_size),
+            self.src.iter_batches(self.batch_size, num=self.n),
+        ):
             batch_n = im.n_images
             im_centered = im - self.src.vol_forward(mean_vol, i, self.batch_size)
 
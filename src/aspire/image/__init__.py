@@ -5,6 +5,7 @@ from .image import (
     FBBasisImage,
     Image,
     PolarImage,
+    _crop_spectrum,
     _im_translate2,
     normalize_bg,
 )
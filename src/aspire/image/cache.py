@@ -0,0 +1,133 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class StepCache:
+    """
+    A cache of intermediate results of a `Pipeline`, keyed by strings that the caller derives from what produced
+    each result (never from the content of the images themselves).
+
+    Arrays are kept in memory up to a byte budget, evicting the least recently used first. If a location is given,
+    evicted arrays are spilled to a private directory under it, and read back on demand. Spilled arrays are deleted
+    when the cache is cleared, and the directory itself when the cache is garbage collected.
+    """
+
+    def __init__(self, max_bytes=0, location=None):
+        """
+        :param max_bytes: Maximum total size, in bytes, of arrays held in memory.
+        :param location: None to keep no arrays on disk (default), or the path of a directory under which
+            to spill arrays evicted from memory.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._on_disk = set()
+        self._lock = threading.Lock()
+
+        self.location = None
+        if location is not None:
+            os.makedirs(location, exist_ok=True)
+            self.location = tempfile.mkdtemp(prefix="aspire_steps_", dir=location)
+            self._finalizer = weakref.finalize(
+                self, shutil.rmtree, self.location, ignore_errors=True
+            )
+
+    def __len__(self):
+        return len(self._entries) + len(self._on_disk)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._on_disk
+
+    def _path(self, key):
+        return os.path.join(self.location, f"{key}.npy")
+
+    def get(self, key):
+        """
+        Look up an array.
+
+        :param key: The key the array was stored under.
+        :return: A copy of the stored array, or None if it is not in the cache.
+        """
+        with self._lock:
+            array = self._entries.get(key)
+            if array is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return array.copy()
+            on_disk = key in self._on_disk
+
+        if not on_disk:
+            self.misses += 1
+            return None
+
+        try:
+            array = np.load(self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not read cached step {key}: {e}")
+            with self._lock:
+                self._on_disk.discard(key)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # Bring the array back into memory, where the next lookup will find it
+        self._put(key, array)
+        return array.copy()
+
+    def put(self, key, array):
+        """
+        Store a copy of an array.
+
+        :param key: A string uniquely identifying how the array was produced.
+        :param array: An ndarray.
+        """
+        self._put(key, np.array(array))
+
+    def _put(self, key, array):
+        spilled = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = array
+            self.nbytes += array.nbytes
+            while self.nbytes > self.max_bytes and self._entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                if self.location is not None and evicted_key not in self._on_disk:
+                    spilled.append((evicted_key, evicted))
+
+        # Disk writes happen outside the lock, so that readers are not held up
+        for evicted_key, evicted in spilled:
+            path = self._path(evicted_key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp.npy"
+            np.save(tmp_path, evicted)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._on_disk.add(evicted_key)
+
+    def clear(self):
+        """
+        Remove all arrays from the cache, in memory and on disk.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            on_disk, self._on_disk = self._on_disk, set()
+        for key in on_disk:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
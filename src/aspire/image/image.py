@@ -3,7 +3,6 @@ import logging
 import matplotlib.pyplot as plt
 import mrcfile
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
 from scipy.linalg import lstsq
 
 import aspire.volume
@@ -66,6 +65,25 @@ def _im_translate2(im, shifts):
     return Image(im_translated)
 
 
+def _crop_spectrum(im_f, ds_res):
+    """
+    Crop centered 2D Fourier transforms of images to the frequencies below the Nyquist frequency of a lower resolution.
+    :param im_f: An array of centered 2D Fourier transforms, of shape (n, L, L).
+    :param ds_res: The new resolution, <= L.
+    :return: The cropped transforms, of shape (n, ds_res, ds_res), scaled so that their inverse transforms at
+        resolution `ds_res` preserve pixel values rather than their sums.
+    """
+    res = im_f.shape[-1]
+    # The zero frequency of a centered transform of size L is at index L // 2
+    start = res // 2 - ds_res // 2
+    im_f = im_f[:, start : start + ds_res, start : start + ds_res] * (ds_res / res) ** 2
+    if ds_res % 2 == 0:
+        # The Nyquist frequency of an even size has no counterpart of opposite sign in the cropped spectrum
+        im_f[:, 0, :] = 0
+        im_f[:, :, 0] = 0
+    return im_f
+
+
 def normalize_bg(imgs, bg_radius=1.0, do_ramp=True):
     """
     Normalize backgrounds and apply to a stack of images
@@ -207,34 +225,23 @@ class Image:
         """
         Downsample Image to a specific resolution. This method returns a new Image.
 
+        The centered spectrum of all images is cropped to the frequencies below the Nyquist frequency of the new
+        resolution, and transformed back at that resolution. This resamples the band-limited images exactly,
+        keeping the center of the images in place.
+
         :param ds_res: int - new resolution, should be <= the current resolution
             of this Image
         :return: The downsampled Image object.
         """
-        grid = grid_2d(self.res)
-        grid_ds = grid_2d(ds_res)
-
-        im_ds = np.zeros((self.n_images, ds_res, ds_res), dtype=self.dtype)
-
-        # x, y values corresponding to 'grid'. This is what scipy interpolator needs to function.
-        res_by_2 = self.res / 2
-        x = y = np.ceil(np.arange(-res_by_2, res_by_2)) / res_by_2
-
-        mask = (np.abs(grid["x"]) < ds_res / self.res) & (
-            np.abs(grid["y"]) < ds_res / self.res
-        )
-        im_shifted = fft.centered_ifft2(
-            fft.centered_fft2(xp.asarray(self.data)) * xp.asarray(mask)
+        ensure(
+            ds_res <= self.res,
+            f"Cannot downsample images of resolution {self.res} to {ds_res}.",
         )
-        im = np.real(xp.asnumpy(im_shifted))
 
-        for s in range(im_ds.shape[0]):
-            interpolator = RegularGridInterpolator(
-                (x, y), im[s], bounds_error=False, fill_value=0
-            )
-            im_ds[s] = interpolator(np.dstack([grid_ds["x"], grid_ds["y"]]))
+        im_f = _crop_spectrum(fft.centered_fft2(xp.asarray(self.data)), ds_res)
+        im_ds = np.real(xp.asnumpy(fft.centered_ifft2(im_f)))
 
-        return Image(im_ds)
+        return Image(im_ds.astype(self.dtype, copy=False))
 
     def filter(self, filter):
         """
@@ -259,10 +266,17 @@ class Image:
     def rotate(self):
         raise NotImplementedError
 
-    def save(self, mrcs_filepath, overwrite=False):
+    def save(self, mrcs_filepath, overwrite=False, dtype=np.float32):
+        """
+        Save images to an MRC file.
+
+        :param mrcs_filepath: Path of the MRC file.
+        :param overwrite: Whether to overwrite an existing file.
+        :param dtype: Data type written to the file, float32 (MRC mode 2, default) or float16 (MRC mode 12).
+        """
         with mrcfile.new(mrcs_filepath, overwrite=overwrite) as mrc:
             # original input format (the image index first)
-            mrc.set_data(self.data.astype(np.float32))
+            mrc.set_data(self.data.astype(dtype))
 
     def _im_translate(self, shifts):
         """
@@ -271,8 +285,6 @@ class Image:
         :param shifts: An array of size n-by-2 specifying the shifts in pixels.
             Alternatively, it can be a row vector of length 2, in which case the same shifts is applied to each image.
         :return: The images translated by the shifts, with periodic boundaries.
-
-        TODO: This implementation is slower than _im_translate2
         """
         im = self.data
 
@@ -295,18 +307,19 @@ class Image:
             xp.asarray(np.ceil(np.arange(-L / 2, L / 2, dtype=self.dtype)))
         )
         grid_1d = xp.asnumpy(grid_shifted) * 2 * np.pi / L
-        om_x, om_y = np.meshgrid(grid_1d, grid_1d, indexing="ij")
-
-        phase_shifts_x = -shifts[:, 0].reshape((n_shifts, 1, 1))
-        phase_shifts_y = -shifts[:, 1].reshape((n_shifts, 1, 1))
 
-        phase_shifts = (
-            om_x[np.newaxis, :, :] * phase_shifts_x
-            + om_y[np.newaxis, :, :] * phase_shifts_y
+        # The phase ramp of each image is the outer product of a ramp along x and one along y,
+        # so it is applied as two broadcasted products in place, without forming n_shifts x L x L phases.
+        phases_x = np.exp(1j * shifts[:, 0, np.newaxis] * grid_1d).astype(
+            im_f.dtype, copy=False
         )
-        mult_f = np.exp(-1j * phase_shifts)
-        im_translated_f = im_f * mult_f
-        im_translated = xp.asnumpy(fft.ifft2(xp.asarray(im_translated_f)))
+        phases_y = np.exp(1j * shifts[:, 1, np.newaxis] * grid_1d).astype(
+            im_f.dtype, copy=False
+        )
+        im_f *= phases_x[:, :, np.newaxis]
+        im_f *= phases_y[:, np.newaxis, :]
+
+        im_translated = xp.asnumpy(fft.ifft2(xp.asarray(im_f)))
         im_translated = np.real(im_translated)
 
         return Image(im_translated)
@@ -348,7 +361,7 @@ class Image:
 
         im_f = im_f.flatten()
 
-        vol = anufft(im_f, pts_rot, (L, L, L), real=True) / L
+        vol = anufft(im_f, pts_rot, (L, L, L), real=True, site="projection") / L
 
         return aspire.volume.Volume(vol)
 
@@ -1,10 +1,15 @@
+import hashlib
 import logging
+import uuid
 
 import numpy as np
-from joblib import Memory
 
-from aspire.image import Image
-from aspire.operators import PowerFilter, ZeroFilter
+from aspire import config
+from aspire.image import Image, _crop_spectrum
+from aspire.image.cache import StepCache
+from aspire.numeric import fft, xp
+from aspire.operators import LambdaFilter, PowerFilter, ZeroFilter
+from aspire.utils import group_indices
 from aspire.utils.random import randn
 
 logger = logging.getLogger(__name__)
@@ -46,6 +51,13 @@ class Xform:
         def __exit__(self, exc_type, exc_value, exc_traceback):
             self.xform.active = self.xform_old_state
 
+    # Whether the forward transformation multiplies each image's Fourier transform by some array, in which case it
+    # implements `_fourier_multiplier` and a `Pipeline` may fuse it with neighbouring Xforms of the same kind.
+    fourier_diagonal = False
+    # Whether the forward transformation crops the centered 2D Fourier transform of each image to a lower resolution,
+    # in which case it implements `_fourier_crop` and a `Pipeline` may fuse it with Fourier-diagonal Xforms.
+    fourier_crop = False
+
     def __init__(self, active=True):
         """
         Create a Xform object that works at a specific resolution.
@@ -71,6 +83,30 @@ class Xform:
             "Subclasses must implement the _forward method applicable to im/indices."
         )
 
+    def _fourier_multiplier(self, L, indices, dtype):
+        """
+        The array by which the forward transformation multiplies the centered 2D Fourier transforms of images.
+        Only called on Xforms whose `fourier_diagonal` attribute is True.
+        :param L: The resolution of the images.
+        :param indices: The indices of the images within this Xform.
+        :param dtype: The real dtype of the images.
+        :return: A scalar, or an ndarray broadcastable to shape (len(indices), L, L).
+        """
+        raise NotImplementedError(
+            "Subclasses with fourier_diagonal set must implement the _fourier_multiplier method."
+        )
+
+    def _fourier_crop(self, im_f):
+        """
+        Crop the centered 2D Fourier transforms of images as the forward transformation does.
+        Only called on Xforms whose `fourier_crop` attribute is True.
+        :param im_f: An ndarray of centered 2D Fourier transforms of Hermitian symmetry, of shape (n, L, L).
+        :return: An ndarray of centered 2D Fourier transforms of Hermitian symmetry at the new resolution.
+        """
+        raise NotImplementedError(
+            "Subclasses with fourier_crop set must implement the _fourier_crop method."
+        )
+
     def enabled(self):
         """
         Enable this Xform in a context manager, regardless of its `active` attribute value.
@@ -136,13 +172,19 @@ class Multiply(SymmetricXform):
         super().__init__()
         self.multipliers = np.array(factor)
 
-    def _forward(self, im, indices):
+    fourier_diagonal = True
+
+    def _factors(self, indices):
         if self.multipliers.size == 1:  # if we have a scalar multiplier
-            im_new = im * self.multipliers
-        else:
-            im_new = im * self.multipliers[indices]
+            return self.multipliers
+        # One factor per image, broadcast over its pixels
+        return self.multipliers[indices].reshape(-1, 1, 1)
 
-        return im_new
+    def _forward(self, im, indices):
+        return im * self._factors(indices)
+
+    def _fourier_multiplier(self, L, indices, dtype):
+        return self._factors(indices)
 
     def __str__(self):
         if self.multipliers.size == 1:
@@ -172,6 +214,19 @@ class Shift(LinearXform):
 
         return im_new
 
+    fourier_diagonal = True
+
+    def _fourier_multiplier(self, L, indices, dtype):
+        shifts = self.shifts if self.shifts.ndim == 1 else self.shifts[indices]
+        shifts = np.atleast_2d(shifts).astype(dtype)
+
+        # Same phases as `Image.shift`, on the centered frequency grid, formed as outer products of 1D ramps
+        grid_1d = np.ceil(np.arange(-L / 2, L / 2, dtype=shifts.dtype)) * 2 * np.pi / L
+        phases_x = np.exp(1j * shifts[:, 0, np.newaxis] * grid_1d)
+        phases_y = np.exp(1j * shifts[:, 1, np.newaxis] * grid_1d)
+
+        return phases_x[:, :, np.newaxis] * phases_y[:, np.newaxis, :]
+
     def _adjoint(self, im, indices):
         if self.shifts.ndim == 1:
             im_new = im.shift(-self.shifts)
@@ -198,6 +253,11 @@ class Downsample(LinearXform):
     def _forward(self, im, indices):
         return im.downsample(self.resolution)
 
+    fourier_crop = True
+
+    def _fourier_crop(self, im_f):
+        return _crop_spectrum(im_f, self.resolution)
+
     def _adjoint(self, im, indices):
         # TODO: Implement up-sampling with zero-padding
         raise NotImplementedError("Adjoint of downsampling not implemented yet.")
@@ -219,9 +279,14 @@ class FilterXform(SymmetricXform):
         super().__init__()
         self.filter = filter
 
+    fourier_diagonal = True
+
     def _forward(self, im, indices):
         return im.filter(self.filter)
 
+    def _fourier_multiplier(self, L, indices, dtype):
+        return self.filter.evaluate_grid(L)
+
     def __str__(self):
         return f"FilterXform ({self.filter})"
 
@@ -358,26 +423,77 @@ class IndexedXform(Xform):
 
         im_data = np.empty_like(im.asnumpy())
 
-        # For each individual transformation
-        for i, xform in enumerate(self.unique_xforms):
-            # Get the indices corresponding to that transformation
-            idx = np.flatnonzero(self.indices == i)
-            # For the incoming Image object, find out which transformation indices are applicable
-            idx = np.intersect1d(idx, indices)
-            # For the transformation indices we found, find the indices in the Image object that we'll use
-            im_data_indices = np.flatnonzero(np.isin(indices, idx))
-            # Apply the transformation to the selected indices in the Image object
-            if len(im_data_indices) > 0:
-                fn_handle = getattr(xform, which)
-                im_data[im_data_indices] = fn_handle(
-                    Image(im[im_data_indices])
-                ).asnumpy()
+        # For each transformation used by the incoming Image object, the indices in the Image object it applies to
+        for i, im_data_indices in group_indices(self.indices[indices]):
+            fn_handle = getattr(self.unique_xforms[i], which)
+            im_data[im_data_indices] = fn_handle(Image(im[im_data_indices])).asnumpy()
 
         return Image(im_data)
 
     def _forward(self, im, indices):
         return self._indexed_operation(im, indices, "forward")
 
+    @property
+    def fourier_diagonal(self):
+        return all(xform.fourier_diagonal for xform in self.unique_xforms)
+
+    def _fourier_multiplier(self, L, indices, dtype):
+        selections, multipliers = [], []
+        for i, selection in group_indices(self.indices[indices]):
+            xform = self.unique_xforms[i]
+            multiplier = 1
+            if xform.active:
+                multiplier = _hermitian_part(
+                    xform._fourier_multiplier(L, indices[selection], dtype)
+                )
+            selections.append(selection)
+            multipliers.append(multiplier)
+
+        result = np.empty(
+            (len(indices), L, L), dtype=np.result_type(dtype, *multipliers)
+        )
+        for selection, multiplier in zip(selections, multipliers):
+            result[selection] = multiplier
+
+        return result
+
+
+class IndexedFilterXform(SymmetricXform):
+    """
+    A `Xform` that applies to each image its own filter, out of a batch of filters (such as a `BatchCTFFilter`)
+    that are evaluated together rather than one at a time.
+    """
+
+    fourier_diagonal = True
+
+    def __init__(self, filters, indices, f=None):
+        """
+        :param filters: A batch of filters, indexable by arrays of indices.
+        :param indices: For each image, the index in `filters` of the filter to apply to it.
+        :param f: An optional function applied to the filter values, as in `LambdaFilter` (e.g. np.sign to
+            phase flip with a batch of CTFs).
+        """
+        super().__init__()
+        self.filters = filters
+        self.indices = np.asarray(indices)
+        self.f = f
+
+    def _fourier_multiplier(self, L, indices, dtype):
+        # Each filter used in the batch is evaluated once, however many images share it
+        labels, inverse = np.unique(self.indices[indices], return_inverse=True)
+        filters = self.filters[labels]
+        if self.f is not None:
+            filters = LambdaFilter(filters, self.f)
+        return filters.evaluate_grid(L)[inverse]
+
+    def _forward(self, im, indices):
+        im_f = xp.asnumpy(fft.centered_fft2(xp.asarray(im.asnumpy())))
+        im_f *= self._fourier_multiplier(im.res, indices, im.dtype)
+        return Image(np.real(xp.asnumpy(fft.centered_ifft2(xp.asarray(im_f)))))
+
+    def __str__(self):
+        return f"IndexedFilterXform ({self.filters})"
+
 
 class LinearIndexedXform(IndexedXform, LinearXform):
     def _adjoint(self, im, indices):
@@ -386,8 +502,7 @@ class LinearIndexedXform(IndexedXform, LinearXform):
 
 def _apply_xform(xform, im, indices, adjoint=False):
     """
-    A simple global function (i.e. not a method) that is capable of being cached by joblib.Memory object's `cache`
-    method.
+    Apply the forward or adjoint transformation of a single `Xform` to `im`.
     """
     if not adjoint:
         logger.info("  Applying " + str(xform))
@@ -397,6 +512,70 @@ def _apply_xform(xform, im, indices, adjoint=False):
         return xform.adjoint(im, indices=indices)
 
 
+def _hermitian_part(multiplier):
+    """
+    Given a multiplier of centered 2D Fourier transforms, return the one with the same effect on the transform of a
+    real image, followed by taking the real part of the result. The product of two such multipliers keeps this property.
+    """
+    multiplier = np.asarray(multiplier)
+    if multiplier.ndim < 2:
+        # Real scalars, possibly one per image
+        return multiplier
+
+    flipped = multiplier[..., ::-1, ::-1]
+    if multiplier.shape[-1] % 2 == 0:
+        # For even sizes, frequency -k lives at index L - k of the centered transform, not L - 1 - k
+        flipped = np.roll(flipped, 1, axis=(-2, -1))
+    if np.iscomplexobj(multiplier):
+        flipped = np.conj(flipped)
+    if np.array_equal(multiplier, flipped):
+        return multiplier
+    return (multiplier + flipped) / 2
+
+
+def _apply_fused(xforms, im, indices):
+    """
+    Apply the forward transformations of several Fourier-diagonal or Fourier-cropping `Xform`s with one pair of FFTs,
+    by multiplying the Fourier transforms of the images by the product of the multipliers between crops,
+    and cropping them in turn.
+    """
+    logger.info("  Applying fused " + ", ".join(str(xform) for xform in xforms))
+    dtype = im.dtype
+
+    im_f = xp.asnumpy(fft.centered_fft2(xp.asarray(im.asnumpy())))
+    # Applied one at a time, each Xform hands on only the real part of its output, which amounts to keeping
+    # the Hermitian part of its multiplier. Crops keep the Hermitian symmetry of transforms.
+    multiplier = 1
+    for xform in xforms:
+        if xform.fourier_crop:
+            im_f = xform._fourier_crop(im_f * multiplier)
+            multiplier = 1
+        else:
+            multiplier = multiplier * _hermitian_part(
+                xform._fourier_multiplier(im_f.shape[-1], indices, dtype)
+            )
+    im_f *= multiplier
+    im = np.real(xp.asnumpy(fft.centered_ifft2(xp.asarray(im_f))))
+
+    return Image(im)
+
+
+def _fusable(xform):
+    # Inactive Xforms are the identity, which fuses with anything
+    return xform.fourier_diagonal or xform.fourier_crop or not xform.active
+
+
+def _xform_token(xform):
+    """
+    A token identifying a `Xform` object for the lifetime of the process, assigned on first use.
+    Unlike `id`, tokens are never reused after the object is garbage collected.
+    """
+    token = getattr(xform, "_cache_token", None)
+    if token is None:
+        token = xform._cache_token = uuid.uuid4().hex
+    return token
+
+
 class Pipeline(Xform):
     """
     A `Pipeline` is a `Xform` made up of individual transformation steps (i.e. multiple `Xform` objects).
@@ -406,19 +585,38 @@ class Pipeline(Xform):
     In addition to keeping client-side code clean, a major advantage of `Pipeline` is that individual steps of the
     pipeline can be cached transparently by the `Pipeline`, providing significant performance advantages for steps that
     are performed repeatedly (especially during development while setting up these pipelines) on any Image/Xform pair.
-    This caching uses `joblib.Memory` object behind the scenes, but is disabled by default.
+    The result of each forward step is cached under a key made from this pipeline, the image indices, and the
+    identity and state of the `Xform` objects applied so far; images themselves are never hashed. This assumes
+    that the images fed to the pipeline for a given set of indices do not change, so owners of the pipeline call
+    `clear_cache` when they do. Caching is disabled by default.
     """
 
-    def __init__(self, xforms=None, memory=None):
+    def __init__(self, xforms=None, memory=None, cache_bytes=None, fuse=None):
         """
         Initialize a `Pipeline` with `Xform` objects.
         :param xforms: An iterable of Xform objects to use in the Pipeline.
-        :param memory: None for no caching (default), or the location of a directory to use to cache steps of the
-            pipeline.
+        :param memory: None for no caching on disk (default), or the location of a directory under which to
+            spill cached steps of the pipeline that no longer fit in memory.
+        :param cache_bytes: Maximum size in bytes of cached steps held in memory.
+            If None, the value from the `pipeline` section of the configuration is used.
+            Steps are cached only if this is positive or `memory` is given.
+        :param fuse: Whether to apply consecutive Fourier-diagonal `Xform`s with a single pair of FFTs.
+            If None, the value from the `pipeline` section of the configuration is used.
         """
         self.xforms = xforms or []
         self.memory = memory
         self.active = True
+        if fuse is None:
+            fuse = config.pipeline.fuse
+        self.fuse = bool(fuse)
+
+        if cache_bytes is None:
+            cache_bytes = config.pipeline.cache_bytes
+        self._cache = None
+        if memory is not None or cache_bytes > 0:
+            self._cache = StepCache(max_bytes=cache_bytes, location=memory)
+        # Distinguishes the steps of this pipeline from those of any other sharing the cache directory
+        self._namespace = uuid.uuid4().hex
 
     def __str__(self):
         return "Apply pipeline: " + " ".join([f"{xform}" for xform in self.xforms])
@@ -445,14 +643,83 @@ class Pipeline(Xform):
         :return: None
         """
         self.xforms = []
+        self.clear_cache()
 
-    def _forward(self, im, indices):
-        memory = Memory(location=self.memory, verbose=0)
-        _apply_transform_cached = memory.cache(_apply_xform)
+    def clear_cache(self):
+        """
+        Forget all cached steps, e.g. because the images fed to the pipeline have changed.
+        :return: None
+        """
+        if self._cache is not None:
+            self._cache.clear()
 
-        logger.info("Applying forward transformations in pipeline")
+    def _step_keys(self, indices):
+        """
+        :return: A list of cache keys, one for the output of each step of the pipeline on images at `indices`.
+        """
+        h = hashlib.blake2b(self._namespace.encode(), digest_size=20)
+        h.update(np.ascontiguousarray(indices, dtype=np.int64).tobytes())
+        keys = []
         for xform in self.xforms:
-            im = _apply_transform_cached(xform, im, indices, False)
+            h.update(f"|{_xform_token(xform)}:{int(xform.active)}".encode())
+            keys.append(h.hexdigest())
+        return keys
+
+    def cached(self, indices):
+        """
+        Look up the output of the whole pipeline for images at `indices`, without needing its input.
+        :param indices: A numpy array of image indices.
+        :return: An Image object, or None if caching is disabled or the output is not cached.
+        """
+        if not self.active or self._cache is None or not self.xforms:
+            return None
+        data = self._cache.get(self._step_keys(indices)[-1])
+        if data is None:
+            return None
+        return Image(data)
+
+    def _segments(self, start=0):
+        """
+        Split the steps of the pipeline from `start` onwards into runs that are applied together.
+        :return: A list of (begin, end) positions; runs of two or more Fourier-diagonal or Fourier-cropping Xforms
+            are fused.
+        """
+        segments = []
+        k = start
+        while k < len(self.xforms):
+            end = k + 1
+            if self.fuse and _fusable(self.xforms[k]):
+                while end < len(self.xforms) and _fusable(self.xforms[end]):
+                    end += 1
+            segments.append((k, end))
+            k = end
+        return segments
+
+    def _forward(self, im, indices):
+        keys = None
+        start = 0
+        if self._cache is not None and self.xforms:
+            # Resume after the last step whose output is cached
+            keys = self._step_keys(indices)
+            for k in range(len(keys) - 1, -1, -1):
+                data = self._cache.get(keys[k])
+                if data is not None:
+                    im = Image(data)
+                    start = k + 1
+                    break
+
+        logger.info(
+            f"Applying forward transformations in pipeline ({start} steps cached)"
+        )
+        for begin, end in self._segments(start):
+            xforms = [xform for xform in self.xforms[begin:end] if xform.active]
+            if len(xforms) > 1:
+                im = _apply_fused(xforms, im, indices)
+            else:
+                for xform in xforms:
+                    im = _apply_xform(xform, im, indices, False)
+            if keys is not None:
+                self._cache.put(keys[end - 1], im.asnumpy())
         logger.info("All forward transformations applied")
 
         return im
@@ -460,12 +727,9 @@ class Pipeline(Xform):
 
 class LinearPipeline(Pipeline, LinearXform):
     def _adjoint(self, im, indices):
-        memory = Memory(location=self.memory, verbose=0)
-        _apply_transform_cached = memory.cache(_apply_xform)
-
         logger.info("Applying adjoint transformations in pipeline")
         for xform in self.xforms[::-1]:
-            im = _apply_transform_cached(xform, im, indices, True)
+            im = _apply_xform(xform, im, indices, True)
         logger.info("All adjoint transformations applied")
 
         return im
@@ -2,8 +2,8 @@ import logging
 
 import numpy as np
 
-from aspire.numeric import fft, xp
 from aspire.operators import ArrayFilter, ScalarFilter
+from aspire.source.accumulators import MaskedMoments, MaskedPowerSpectrum
 from aspire.utils.coor_trans import grid_2d
 
 logger = logging.getLogger(__name__)
@@ -17,12 +17,15 @@ class NoiseEstimator:
     Noise Estimator base class.
     """
 
-    def __init__(self, src, bgRadius=1, batchSize=512):
+    def __init__(self, src, bgRadius=1, batchSize=512, accumulator=None):
         """
         Any additional args/kwargs are passed on to the Source's 'images' method
         :param src: A Source object which can give us images on demand
         :param bgRadius: The radius of the disk whose complement is used to estimate the noise.
         :param batchSize:  The size of the batches in which to compute the variance estimate
+        :param accumulator: An accumulator made by this class' `make_accumulator` method, to which all images of
+            `src` have already been pushed, typically by `ImageSource.accumulate` in a pass shared with other
+            statistics. If None, the images are read in a pass of their own.
         """
 
         self.src = src
@@ -31,9 +34,29 @@ class NoiseEstimator:
         self.n = src.n
         self.bgRadius = bgRadius
         self.batchSize = batchSize
+        self._accumulator = accumulator
 
         self.filter = self._create_filter()
 
+    @classmethod
+    def make_accumulator(cls, src, bgRadius=1):
+        """
+        :param src: A Source object whose images will be pushed to the accumulator.
+        :param bgRadius: The radius of the disk whose complement is used to estimate the noise.
+        :return: An empty `Accumulator` gathering the statistics this estimator needs.
+        """
+        raise NotImplementedError("Subclasses implement the `make_accumulator` method.")
+
+    def _accumulate(self):
+        """
+        :return: The accumulator passed at construction, or a new one filled in a pass over the images.
+        """
+        if self._accumulator is not None:
+            return self._accumulator
+        accumulator = self.make_accumulator(self.src, self.bgRadius)
+        self.src.accumulate([accumulator], self.batchSize, num=self.n)
+        return accumulator
+
     def estimate(self):
         """
         :return: The estimated noise variance of the images.
@@ -69,20 +92,12 @@ class WhiteNoiseEstimator(NoiseEstimator):
         :return: The estimated noise variance of the images in the Source used to create this estimator.
         TODO: How's this initial estimate of variance different from the 'estimate' method?
         """
-        # Run estimate using saved parameters
-        g2d = grid_2d(self.L, dtype=self.dtype)
-        mask = g2d["r"] >= self.bgRadius
-
-        first_moment = 0
-        second_moment = 0
-        for i in range(0, self.n, self.batchSize):
-            images = self.src.images(start=i, num=self.batchSize).asnumpy()
-            images_masked = images * mask
+        return self._accumulate().variance
 
-            _denominator = self.n * np.sum(mask)
-            first_moment += np.sum(images_masked) / _denominator
-            second_moment += np.sum(np.abs(images_masked ** 2)) / _denominator
-        return second_moment - first_moment ** 2
+    @classmethod
+    def make_accumulator(cls, src, bgRadius=1):
+        g2d = grid_2d(src.L, dtype=src.dtype)
+        return MaskedMoments(g2d["r"] >= bgRadius)
 
 
 class AnisotropicNoiseEstimator(NoiseEstimator):
@@ -110,22 +125,9 @@ class AnisotropicNoiseEstimator(NoiseEstimator):
         :return: The estimated noise variance of the images in the Source used to create this estimator.
         TODO: How's this initial estimate of variance different from the 'estimate' method?
         """
-        # Run estimate using saved parameters
-        g2d = grid_2d(self.L)
-        mask = g2d["r"] >= self.bgRadius
-
-        mean_est = 0
-        noise_psd_est = np.zeros((self.L, self.L)).astype(self.src.dtype)
-        for i in range(0, self.n, self.batchSize):
-            images = self.src.images(i, self.batchSize).asnumpy()
-            images_masked = images * mask
-
-            _denominator = self.n * np.sum(mask)
-            mean_est += np.sum(images_masked) / _denominator
-            im_masked_f = xp.asnumpy(fft.centered_fft2(xp.asarray(images_masked)))
-            noise_psd_est += np.sum(np.abs(im_masked_f ** 2), axis=0) / _denominator
-
-        mid = self.L // 2
-        noise_psd_est[mid, mid] -= mean_est ** 2
+        return self._accumulate().power_spectrum.astype(self.src.dtype)
 
-        return noise_psd_est
+    @classmethod
+    def make_accumulator(cls, src, bgRadius=1):
+        g2d = grid_2d(src.L)
+        return MaskedPowerSpectrum(g2d["r"] >= bgRadius)
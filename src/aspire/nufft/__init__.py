@@ -1,4 +1,6 @@
+import hashlib
 import logging
+import threading
 from collections import OrderedDict
 
 import numpy as np
@@ -122,6 +124,24 @@ def backend_available(backend):
     return backend in all_backends()
 
 
+def nufft_epsilon(dtype, site=None):
+    """
+    The precision requested of NUFFTs on data of a given dtype, following the `nfft` section of the configuration.
+
+    :param dtype: dtype of the points or signal, single or double precision.
+    :param site: Optional name of the calling subsystem, one of 'basis', 'projection' or 'reconstruction',
+        whose `epsilon_<site>` setting overrides the dtype default when positive.
+    :return: The requested precision as a float.
+    """
+    settings = dict(config.nfft.items())
+    if site is not None:
+        epsilon = float(settings.get(f"epsilon_{site}", 0))
+        if epsilon > 0:
+            return epsilon
+
+    return float(settings[f"epsilon_{np.dtype(real_type(dtype)).name}"])
+
+
 class Plan:
     # TODO: move common functionality up the hierarchy
     def __new__(cls, *args, **kwargs):
@@ -140,20 +160,229 @@ class Plan:
             # If a Plan-subclass was constructed directly, invoke default behavior
             return super(Plan, cls).__new__(cls)
 
+    @property
+    def nbytes(self):
+        """
+        An estimate of the memory held by this plan, in bytes: its copy of the points,
+        plus an oversampled grid for each of its forward and adjoint transforms.
+        """
+        n_grid = 2 ** self.dim * np.prod(self.sz) * getattr(self, "ntransforms", 1)
+        itemsize = np.dtype(complex_type(self.fourier_pts.dtype)).itemsize
+        return self.fourier_pts.nbytes + 2 * int(n_grid) * itemsize
+
+    @property
+    def lock(self):
+        """
+        A lock to hold while executing this plan, which may be shared between threads through `plan_cache`.
+        """
+        lock = self.__dict__.get("_lock")
+        if lock is None:
+            lock = self.__dict__.setdefault("_lock", threading.Lock())
+        return lock
+
 
-def anufft(sig_f, fourier_pts, sz, real=False):
+class PlanCache:
+    """
+    A cache of NUFFT `Plan`s, so that calls sharing points (eg. the fixed frequencies of a basis)
+    don't plan and sort the points again.
+
+    Plans are held up to a memory budget (see `Plan.nbytes`), evicting the least recently used first.
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        :param max_bytes: Maximum total estimated size, in bytes, of cached plans.
+            If None, the value from the `nfft` section of the configuration is read on every insertion.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _max_bytes(self):
+        if self.max_bytes is None:
+            return config.nfft.plan_cache_bytes
+        return self.max_bytes
+
+    def seen(self, key):
+        """
+        Record that a plan was asked for under a key.
+
+        :param key: The key of the plan.
+        :return: Whether the key had been recorded already (among the 256 most recent).
+        """
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return True
+            self._seen[key] = None
+            if len(self._seen) > 256:
+                self._seen.popitem(last=False)
+            return False
+
+    def get(self, key):
+        """
+        Look up a plan.
+
+        :param key: The key the plan was stored under.
+        :return: The stored `Plan`, or None if it is not in the cache.
+        """
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return plan
+
+    def put(self, key, plan):
+        """
+        Store a plan, evicting the least recently used plans to stay within the memory budget.
+        Plans larger than the budget are not stored.
+
+        :param key: The key to store the plan under.
+        :param plan: A `Plan` object.
+        :return: None
+        """
+        max_bytes = self._max_bytes()
+        nbytes = plan.nbytes
+        if nbytes > max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = plan
+            self.nbytes += nbytes
+            while self.nbytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """
+        Drop all cached plans.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self.nbytes = 0
+
+
+# Shared by `anufft` and `nufft`
+plan_cache = PlanCache()
+
+
+def get_plan(
+    sz, fourier_pts, ntransforms=1, epsilon=None, backend=None, key=None, site=None
+):
+    """
+    Get a `Plan` from `plan_cache`, creating and caching it if needed.
+
+    The returned plan may be shared with other callers; hold `plan.lock` while executing it.
+
+    :param sz: A tuple indicating the geometry of the signal.
+    :param fourier_pts: The points in Fourier space where the Fourier transform is to be calculated,
+            arranged as a dimension-by-K array. These need to be in the range [-pi, pi] in each dimension.
+    :param ntransforms: Number of transforms computed at a time.
+    :param epsilon: The desired precision of the NUFFT. If None, it is given by `nufft_epsilon`.
+    :param backend: String representing the NFFT backend. If None, the default backend is used.
+    :param key: A hashable identifying the values and order of `fourier_pts`, eg. a token held by a caller
+        whose points never change. If None, the points are identified by a hash of their values, and their plan is only cached once
+        they are seen a second time, so that points used once (eg. those of rotated images) don't fill the cache.
+    :param site: Optional name of the calling subsystem, see `nufft_epsilon`.
+    :return: A `Plan` object.
+    """
+    if epsilon is None:
+        epsilon = nufft_epsilon(fourier_pts.dtype, site)
+
+    keep = key is not None
+    if key is None:
+        key = hashlib.sha1(np.ascontiguousarray(fourier_pts)).hexdigest()
+    key = (
+        backend,
+        tuple(sz),
+        ntransforms,
+        fourier_pts.dtype.str,
+        fourier_pts.shape,
+        epsilon,
+        key,
+    )
+
+    plan = plan_cache.get(key)
+    if plan is None:
+        kwargs = {}
+        if backend is not None:
+            kwargs["backend"] = backend
+        plan = Plan(
+            sz=sz,
+            fourier_pts=fourier_pts,
+            epsilon=epsilon,
+            ntransforms=ntransforms,
+            **kwargs,
+        )
+        if plan_cache.seen(key) or keep:
+            plan_cache.put(key, plan)
+    return plan
+
+
+def _point_chunks(fourier_pts, ntransforms):
+    """
+    Split the points of a NUFFT into chunks whose working memory (points, their sorting, and the signal
+    values at them) stays within the `chunk_bytes` budget of the `nfft` section of the configuration.
+
+    :param fourier_pts: The dimension-by-K array of points.
+    :param ntransforms: Number of transforms computed at a time.
+    :return: A list of slices of the K points.
+    """
+    dim, num_pts = fourier_pts.shape
+    itemsize = fourier_pts.dtype.itemsize
+    # Copies of the points held by the plan, the backend's sort index, and complex values for each transform
+    bytes_per_point = 2 * dim * itemsize + 8 + 2 * ntransforms * 2 * itemsize
+
+    budget = config.nfft.chunk_bytes
+    if budget <= 0 or num_pts * bytes_per_point <= budget:
+        return [slice(0, num_pts)]
+
+    chunk_size = max(1, budget // bytes_per_point)
+    logger.debug(
+        f"Splitting NUFFT of {num_pts} points into chunks of {chunk_size} points."
+    )
+    return [
+        slice(start, min(start + chunk_size, num_pts))
+        for start in range(0, num_pts, chunk_size)
+    ]
+
+
+def anufft(sig_f, fourier_pts, sz, real=False, key=None, epsilon=None, site=None):
     """
     Wrapper for 1, 2, and 3 dimensional Non Uniform FFT Adjoint.
     Dimension is based on the dimension of fourier_pts and checked against sig_f.
 
     Selects best available package from `nfft` `backends` configuration list.
 
+    Points are split into chunks transformed in turn when their working memory would exceed
+    the `chunk_bytes` budget of the `nfft` configuration section.
+
     :param sig_f: Array representing the signal(s) in Fourier space to be transformed. \
     sig_f either matches length of fourier_pts or sig_f.shape is stack of (`ntransforms`, ...).
     :param fourier_pts: The points in Fourier space where the Fourier transform is to be calculated,
             arranged as a dimension-by-K array. These need to be in the range [-pi, pi] in each dimension.
     :param sz: A tuple indicating the geometry of the signal.
     :param real: Optional Bool indicating if you would like only the real components, Defaults False.
+    :param key: Optional hashable identifying `fourier_pts` in `plan_cache`, see `get_plan`.
+    :param epsilon: Optional precision of the NUFFT. If None, it is given by `nufft_epsilon`.
+    :param site: Optional name of the calling subsystem, see `nufft_epsilon`.
     :return: The Non Uniform FFT adjoint transform.
 
     """
@@ -174,23 +403,54 @@ def anufft(sig_f, fourier_pts, sz, real=False):
     if len(sig_f.shape) == 2:
         ntransforms = sig_f.shape[0]
 
-    plan = Plan(sz=sz, fourier_pts=fourier_pts, ntransforms=ntransforms)
-    adjoint = plan.adjoint(sig_f)
+    # The adjoint sums contributions of all points, so chunks of points are accumulated
+    chunks = _point_chunks(fourier_pts, ntransforms)
+    adjoint = None
+    for chunk in chunks:
+        chunk_key = key
+        if len(chunks) > 1:
+            chunk_key = None if key is None else (key, chunk.start)
+            sig_chunk = np.ascontiguousarray(sig_f[..., chunk])
+        else:
+            sig_chunk = sig_f
+
+        plan = get_plan(
+            sz,
+            fourier_pts[:, chunk],
+            ntransforms=ntransforms,
+            epsilon=epsilon,
+            key=chunk_key,
+            site=site,
+        )
+        with plan.lock:
+            result = plan.adjoint(sig_chunk)
+
+        if adjoint is None:
+            adjoint = result
+        else:
+            adjoint += result
+
     return np.real(adjoint) if real else adjoint
 
 
-def nufft(sig_f, fourier_pts, real=False):
+def nufft(sig_f, fourier_pts, real=False, key=None, epsilon=None, site=None):
     """
     Wrapper for 1, 2, and 3 dimensional Non Uniform FFT
     Dimension is based on the dimension of fourier_pts and checked against sig_f.
 
     Selects best available package from `nfft` `backends` configuration list.
 
+    Points are split into chunks transformed in turn when their working memory would exceed
+    the `chunk_bytes` budget of the `nfft` configuration section.
+
     :param sig_f: Array representing the signal(s) in real space to be transformed. \
     sig_f either matches `sz` or sig_f.shape is stack of (..., `ntransforms`).
     :param fourier_pts: The points in Fourier space where the Fourier transform is to be calculated,
             arranged as a dimension-by-K array. These need to be in the range [-pi, pi] in each dimension.
     :param real: Optional Bool indicating if you would like only the real components, Defaults False.
+    :param key: Optional hashable identifying `fourier_pts` in `plan_cache`, see `get_plan`.
+    :param epsilon: Optional precision of the NUFFT. If None, it is given by `nufft_epsilon`.
+    :param site: Optional name of the calling subsystem, see `nufft_epsilon`.
     :return: The Non Uniform FFT transform.
 
     """
@@ -221,6 +481,29 @@ def nufft(sig_f, fourier_pts, real=False):
     if len(sig_f.shape) == dimension + 1:
         ntransforms = sig_f.shape[0]
 
-    plan = Plan(sz=sz, fourier_pts=fourier_pts, ntransforms=ntransforms)
-    transform = plan.transform(sig_f)
+    # Each point is transformed independently, so chunks of points are concatenated
+    chunks = _point_chunks(fourier_pts, ntransforms)
+    transforms = []
+    for chunk in chunks:
+        chunk_key = key
+        if len(chunks) > 1:
+            chunk_key = None if key is None else (key, chunk.start)
+
+        plan = get_plan(
+            sz,
+            fourier_pts[:, chunk],
+            ntransforms=ntransforms,
+            epsilon=epsilon,
+            key=chunk_key,
+            site=site,
+        )
+        with plan.lock:
+            transforms.append(plan.transform(sig_f))
+
+    if len(chunks) == 1:
+        transform = transforms[0]
+    else:
+        # Backends may squeeze the results of chunks holding a single point
+        shape = (ntransforms, -1) if ntransforms > 1 else (-1,)
+        transform = np.concatenate([np.reshape(t, shape) for t in transforms], axis=-1)
     return np.real(transform) if real else transform
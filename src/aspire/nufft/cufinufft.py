@@ -6,21 +6,21 @@ import pycuda.driver as cuda  # noqa: F401
 import pycuda.gpuarray as gpuarray  # noqa: F401
 from cufinufft import cufinufft
 
-from aspire.nufft import Plan
+from aspire.nufft import Plan, nufft_epsilon
 from aspire.utils import ensure
 
 logger = logging.getLogger(__name__)
 
 
 class CufinufftPlan(Plan):
-    def __init__(self, sz, fourier_pts, epsilon=1e-15, ntransforms=1, **kwargs):
+    def __init__(self, sz, fourier_pts, epsilon=None, ntransforms=1, **kwargs):
         """
         A plan for non-uniform FFT in 2D or 3D.
 
         :param sz: A tuple indicating the geometry of the signal
         :param fourier_pts: The points in Fourier space where the Fourier transform is to be calculated,
             arranged as a dimension-by-K array. These need to be in the range [-pi, pi] in each dimension.
-        :param epsilon: The desired precision of the NUFFT
+        :param epsilon: The desired precision of the NUFFT. If None, it is given by `nufft_epsilon`.
         :param ntransforms: Optional integer indicating if you would like to compute a batch of `ntransforms`
         transforms.  Implies vol_f.shape is (..., `ntransforms`). Defaults to 0 which disables batching.
         """
@@ -52,6 +52,8 @@ class CufinufftPlan(Plan):
         )
 
         self.num_pts = fourier_pts.shape[1]
+        if epsilon is None:
+            epsilon = nufft_epsilon(self.dtype)
         self.epsilon = max(epsilon, np.finfo(self.dtype).eps)
 
         self._transform_plan = cufinufft(
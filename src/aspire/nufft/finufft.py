@@ -3,14 +3,14 @@ import logging
 import finufft
 import numpy as np
 
-from aspire.nufft import Plan
+from aspire.nufft import Plan, nufft_epsilon
 from aspire.utils import complex_type, ensure
 
 logger = logging.getLogger(__name__)
 
 
 class FinufftPlan(Plan):
-    def __init__(self, sz, fourier_pts, epsilon=1e-8, ntransforms=1, **kwargs):
+    def __init__(self, sz, fourier_pts, epsilon=None, ntransforms=1, **kwargs):
         """
         A plan for non-uniform FFT in 2D or 3D.
 
@@ -18,7 +18,7 @@ class FinufftPlan(Plan):
         :param fourier_pts: The points in Fourier space where the Fourier
         transform is to be calculated, arranged as a dimension-by-K array.
         These need to be in the range [-pi, pi] in each dimension.
-        :param epsilon: The desired precision of the NUFFT.
+        :param epsilon: The desired precision of the NUFFT. If None, it is given by `nufft_epsilon`.
         :param ntransforms: Optional integer indicating if you would like
         to compute a batch of `ntransforms`.
         transforms.  Implies vol_f.shape is (`ntransforms`, ...).
@@ -39,6 +39,8 @@ class FinufftPlan(Plan):
 
         self.num_pts = fourier_pts.shape[1]
 
+        if epsilon is None:
+            epsilon = nufft_epsilon(self.dtype)
         self.epsilon = max(epsilon, np.finfo(self.dtype).eps)
         if self.epsilon != epsilon:
             logger.debug(
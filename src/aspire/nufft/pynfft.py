@@ -1,7 +1,7 @@
 import numpy as np
 from pynfft.nfft import NFFT
 
-from aspire.nufft import Plan
+from aspire.nufft import Plan, nufft_epsilon
 from aspire.nufft.utils import nextpow2
 from aspire.utils import ensure
 
@@ -15,18 +15,20 @@ class PyNfftPlan(Plan):
             filter(lambda i_err: i_err[1] < epsilon, enumerate(rel_errs, start=1))
         )[0][0]
 
-    def __init__(self, sz, fourier_pts, epsilon=1e-15, **kwargs):
+    def __init__(self, sz, fourier_pts, epsilon=None, **kwargs):
         """
         A plan for non-uniform FFT (3D)
         :param sz: A tuple indicating the geometry of the signal
         :param fourier_pts: The points in Fourier space where the Fourier transform is to be calculated,
             arranged as a 3-by-K array. These need to be in the range [-pi, pi] in each dimension.
-        :param epsilon: The desired precision of the NUFFT
+        :param epsilon: The desired precision of the NUFFT. If None, it is given by `nufft_epsilon`.
         """
         self.sz = sz
         self.dim = len(sz)
         self.fourier_pts = fourier_pts
         self.num_pts = fourier_pts.shape[1]
+        if epsilon is None:
+            epsilon = nufft_epsilon(fourier_pts.dtype)
         self.epsilon = epsilon
 
         self.cutoff = PyNfftPlan.epsilon_to_nfft_cutoff(epsilon)
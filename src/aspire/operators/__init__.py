@@ -1,11 +1,14 @@
 from .blk_diag_matrix import BlkDiagMatrix
 from .filters import (
     ArrayFilter,
+    BatchCTFFilter,
     CTFFilter,
     DualFilter,
     Filter,
+    FilterGridCache,
     FunctionFilter,
     IdentityFilter,
+    IndexedFilterGrid,
     LambdaFilter,
     MultiplicativeFilter,
     PowerFilter,
@@ -13,5 +16,6 @@ from .filters import (
     ScalarFilter,
     ScaledFilter,
     ZeroFilter,
+    grid_cache,
     voltage_to_wavelength,
 )
@@ -1,10 +1,14 @@
 import inspect
 import logging
 import math
+import threading
+import uuid
+from collections import OrderedDict
 
 import numpy as np
 from scipy.interpolate import RegularGridInterpolator
 
+from aspire import config
 from aspire.utils import ensure
 from aspire.utils.coor_trans import grid_2d
 from aspire.utils.filter_to_fb_mat import filter_to_fb_mat
@@ -16,10 +20,10 @@ logger = logging.getLogger(__name__)
 def voltage_to_wavelength(voltage):
     """
     Convert from electron voltage to wavelength.
-    :param voltage: float, The electron voltage in kV.
-    :return: float, The electron wavelength in nm.
+    :param voltage: float or ndarray, The electron voltage in kV.
+    :return: float or ndarray, The electron wavelength in nm.
     """
-    return 12.2643247 / math.sqrt(voltage * 1e3 + 0.978466 * voltage ** 2)
+    return 12.2643247 / np.sqrt(voltage * 1e3 + 0.978466 * voltage ** 2)
 
 
 def wavelength_to_voltage(wavelength):
@@ -33,6 +37,104 @@ def wavelength_to_voltage(wavelength):
     ) / (2 * 0.978466)
 
 
+class FilterGridCache:
+    """
+    A cache of filter values evaluated by `Filter.evaluate_grid`, keyed by the filter, grid size and dtype.
+
+    Grids are held up to a byte budget, evicting the least recently used first. Cached grids are read-only,
+    and shared by every caller asking for the same filter on the same grid.
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        :param max_bytes: Maximum total size, in bytes, of cached grids.
+            If None, the value from the `filters` section of the configuration is read on every insertion.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _max_bytes(self):
+        if self.max_bytes is None:
+            return config.filters.grid_cache_bytes
+        return self.max_bytes
+
+    def get(self, key):
+        """
+        Look up a grid.
+
+        :param key: The key the grid was stored under.
+        :return: The stored (read-only) grid, or None if it is not in the cache.
+        """
+        with self._lock:
+            grid = self._entries.get(key)
+            if grid is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return grid
+
+    def put(self, key, grid):
+        """
+        Store a grid, evicting the least recently used grids to stay within the byte budget.
+
+        :param key: The key to store the grid under.
+        :param grid: An ndarray, which is marked read-only.
+        :return: The grid as stored, or the grid itself if it is larger than the budget.
+        """
+        max_bytes = self._max_bytes()
+        if grid.nbytes > max_bytes:
+            return grid
+
+        grid.setflags(write=False)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = grid
+            self.nbytes += grid.nbytes
+            while self.nbytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return grid
+
+    def invalidate(self, filter):
+        """
+        Drop every grid cached for a filter, eg. once it has been replaced by a scaled copy.
+
+        :param filter: A `Filter` object.
+        :return: None
+        """
+        token = getattr(filter, "_grid_token", None)
+        if token is None:
+            return
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == token]:
+                self.nbytes -= self._entries.pop(key).nbytes
+
+    def clear(self):
+        """
+        Drop all cached grids.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+# Shared by every `Filter`; grids are looked up by a token unique to each filter object
+grid_cache = FilterGridCache()
+
+
 class Filter:
     def __init__(self, dim=None, radial=False):
         self.dim = dim
@@ -102,16 +204,48 @@ class Filter:
 
         Passes arbritrary args and kwargs down to self.evaluate method.
 
+        Grids of a single filter evaluated without extra arguments are kept in `grid_cache`,
+        and returned read-only on subsequent calls.
+
         :param L: Number of grid points (L by L).
         :param dtype: dtype of grid, defaults np.float32.
         :return: Filter values at omega's points.
         """
+        if args or kwargs:
+            return self._evaluate_grid(L, dtype, *args, **kwargs)
+
+        key = (self._cache_token(), L, np.dtype(dtype).str)
+        h = grid_cache.get(key)
+        if h is None:
+            h = self._evaluate_grid(L, dtype)
+            # Stacks of filters are typically sub-batches built for a single call; not worth keeping
+            if np.ndim(h) == 2:
+                h = grid_cache.put(key, np.array(h))
+        return h
+
+    def _cache_token(self):
+        """
+        A token identifying this filter in `grid_cache`, assigned on first use.
+        Unlike `id`, tokens are never reused after the filter is garbage collected.
+        """
+        token = getattr(self, "_grid_token", None)
+        if token is None:
+            token = self._grid_token = uuid.uuid4().hex
+        return token
 
+    def _evaluate_grid(self, L, dtype=np.float32, *args, **kwargs):
+        """
+        Evaluate the filter on a grid, bypassing `grid_cache`. See `evaluate_grid` for usage.
+        """
         grid2d = grid_2d(L, dtype=dtype)
         omega = np.pi * np.vstack((grid2d["x"].flatten("F"), grid2d["y"].flatten("F")))
         h = self.evaluate(omega, *args, **kwargs)
 
-        h = m_reshape(h, grid2d["x"].shape)
+        if h.ndim > 1:
+            # A stack of filters (see `BatchCTFFilter`), each flattened in the same order as omega
+            h = np.swapaxes(h.reshape(h.shape[:-1] + (L, L)), -1, -2)
+        else:
+            h = m_reshape(h, grid2d["x"].shape)
 
         return h
 
@@ -168,7 +302,7 @@ class PowerFilter(Filter):
     def _evaluate(self, omega):
         return self._filter.evaluate(omega) ** self._power
 
-    def evaluate_grid(self, L, dtype=np.float32, *args, **kwargs):
+    def _evaluate_grid(self, L, dtype=np.float32, *args, **kwargs):
         """
         Calls the provided filter's evaluate_grid method in case there is an optimization.
 
@@ -300,7 +434,7 @@ class ArrayFilter(Filter):
 
         return result
 
-    def evaluate_grid(self, L, dtype=np.float32, *args, **kwargs):
+    def _evaluate_grid(self, L, dtype=np.float32, *args, **kwargs):
         """
         Optimized evaluate_grid method for ArrayFilter.
 
@@ -324,7 +458,7 @@ class ArrayFilter(Filter):
             res = self.xfer_fn_array
         else:
             # Otherwise call parent code to generate a grid then evaluate.
-            res = super().evaluate_grid(L, dtype=dtype, *args, **kwargs)
+            res = super()._evaluate_grid(L, dtype=dtype, *args, **kwargs)
         return res
 
 
@@ -439,3 +573,185 @@ class RadialCTFFilter(CTFFilter):
             alpha=alpha,
             B=B,
         )
+
+
+class BatchCTFFilter(Filter):
+    def __init__(
+        self,
+        pixel_size=10,
+        voltage=200,
+        defocus_u=15000,
+        defocus_v=15000,
+        defocus_ang=0,
+        Cs=2.26,
+        alpha=0.07,
+        B=0,
+    ):
+        """
+        A batch of CTF Filters sharing a pixel size and envelope, evaluated together.
+
+        Evaluating the batch returns one row of values per CTF, in a single broadcasted computation. Indexing it
+        with an integer gives the corresponding `CTFFilter`, and with a slice or an array of indices a smaller
+        `BatchCTFFilter`, so it can stand in for a list of `CTFFilter` objects.
+
+        :param pixel_size:  Pixel size in angstrom
+        :param voltage:     Electron voltages in kV
+        :param defocus_u:   Defocus depths along the u-axis in angstrom
+        :param defocus_v:   Defocus depths along the v-axis in angstrom
+        :param defocus_ang: Angles between the x-axis and the u-axis in radians
+        :param Cs:          Spherical aberration constants
+        :param alpha:       Amplitude contrast phases in radians
+        :param B:           Envelope decay in inverse square angstrom (default 0)
+        Parameters given as scalars are shared by all CTFs of the batch.
+        """
+        super().__init__(dim=2, radial=False)
+        self.pixel_size = pixel_size
+        self.B = B
+        (
+            self.voltage,
+            self.defocus_u,
+            self.defocus_v,
+            self.defocus_ang,
+            self.Cs,
+            self.alpha,
+        ) = (
+            np.array(a, dtype=np.float64)
+            for a in np.broadcast_arrays(
+                *(
+                    np.atleast_1d(a)
+                    for a in (voltage, defocus_u, defocus_v, defocus_ang, Cs, alpha)
+                )
+            )
+        )
+        ensure(self.voltage.ndim == 1, "CTF parameters must be scalars or 1D arrays.")
+
+        self.wavelength = voltage_to_wavelength(self.voltage)
+        self.defocus_mean = 0.5 * (self.defocus_u + self.defocus_v)
+        self.defocus_diff = 0.5 * (self.defocus_u - self.defocus_v)
+
+    def __len__(self):
+        return len(self.voltage)
+
+    def __getitem__(self, key):
+        params = dict(
+            voltage=self.voltage[key],
+            defocus_u=self.defocus_u[key],
+            defocus_v=self.defocus_v[key],
+            defocus_ang=self.defocus_ang[key],
+            Cs=self.Cs[key],
+            alpha=self.alpha[key],
+        )
+        if np.ndim(params["voltage"]) == 0:
+            return CTFFilter(
+                pixel_size=self.pixel_size,
+                B=self.B,
+                **{k: float(v) for k, v in params.items()},
+            )
+        return BatchCTFFilter(pixel_size=self.pixel_size, B=self.B, **params)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __str__(self):
+        return f"BatchCTFFilter ({len(self)} CTFs)"
+
+    def _evaluate(self, omega):
+        """
+        :return: An array of shape (len(self), omega.shape[-1]), computed in the precision of omega.
+        """
+        om_x, om_y = omega / (2 * np.pi * self.pixel_size)
+
+        def column(a):
+            return a.astype(omega.dtype)[:, np.newaxis]
+
+        eps = np.finfo(np.pi).eps
+        ind_nz = (np.abs(om_x) > eps) | (np.abs(om_y) > eps)
+        angles = np.arctan2(om_y, om_x)
+
+        defocus = column(self.defocus_mean) + column(self.defocus_diff) * np.cos(
+            2 * (angles - column(self.defocus_ang))
+        )
+        defocus *= ind_nz
+
+        wavelength = column(self.wavelength)
+        c2 = -np.pi * wavelength * defocus
+        c4 = 0.5 * np.pi * (column(self.Cs) * 1e7) * wavelength ** 3
+
+        r2 = om_x ** 2 + om_y ** 2
+        r4 = r2 ** 2
+        gamma = c2 * r2 + c4 * r4
+        h = column(np.sqrt(1 - self.alpha ** 2)) * np.sin(gamma) - column(
+            self.alpha
+        ) * np.cos(gamma)
+
+        if self.B:
+            h *= np.exp(-self.B * r2)
+
+        return h
+
+    def scale(self, c=1):
+        return BatchCTFFilter(
+            pixel_size=self.pixel_size * c,
+            voltage=self.voltage,
+            defocus_u=self.defocus_u,
+            defocus_v=self.defocus_v,
+            defocus_ang=self.defocus_ang,
+            Cs=self.Cs,
+            alpha=self.alpha,
+            B=self.B,
+        )
+
+
+class IndexedFilterGrid:
+    """
+    Filters evaluated on a grid for each of n images, stored as one grid per distinct filter.
+
+    Indexing behaves as for the dense array of shape (L, L, n) it represents, whose last axis runs over images,
+    and returns a new ndarray holding only the selected images.
+    """
+
+    def __init__(self, grids, indices):
+        """
+        :param grids: An array of shape (L, L, k) holding k distinct filter grids.
+        :param indices: For each of the n images, the index in `grids` of the grid of its filter.
+        """
+        self.grids = grids
+        self.indices = np.asarray(indices)
+        ensure(
+            self.indices.ndim == 1 and np.all(self.indices < grids.shape[-1]),
+            "Filter grid indices must be a 1D array of indices into the grids.",
+        )
+
+    @property
+    def shape(self):
+        return self.grids.shape[:-1] + self.indices.shape
+
+    @property
+    def dtype(self):
+        return self.grids.dtype
+
+    @property
+    def ndim(self):
+        return self.grids.ndim
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        ensure(
+            len(key) <= self.ndim and not any(k is Ellipsis for k in key),
+            "Index filter grids with at most one index per dimension, and no ellipsis.",
+        )
+        key = key + (slice(None),) * (self.ndim - len(key))
+        return self.grids[key[:-1] + (self.indices[key[-1]],)]
+
+    def asnumpy(self):
+        """
+        :return: The dense ndarray of shape (L, L, n).
+        """
+        return self[:, :, :]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.asnumpy(), dtype=dtype)
@@ -80,8 +80,10 @@ class Estimator:
         """
         mean_b = np.zeros((self.L, self.L, self.L), dtype=self.dtype)
 
-        for i in range(0, self.n, self.batch_size):
-            im = self.src.images(i, self.batch_size)
+        for i, im in zip(
+            range(0, self.n, self.batch_size),
+            self.src.iter_batches(self.batch_size, num=self.n),
+        ):
             batch_mean_b = self.src.im_backward(im, i) / self.n
             mean_b += batch_mean_b.astype(self.dtype)
 
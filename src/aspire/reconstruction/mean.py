@@ -34,7 +34,13 @@ class MeanEstimator(Estimator):
             kernel += (
                 1
                 / (self.n * self.L ** 4)
-                * anufft(weights, pts_rot, (_2L, _2L, _2L), real=True)
+                * anufft(
+                    weights,
+                    pts_rot,
+                    (_2L, _2L, _2L),
+                    real=True,
+                    site="reconstruction",
+                )
             )
 
         # Ensure symmetric kernel
@@ -1,5 +1,11 @@
 import logging
 
+from aspire.source.accumulators import (
+    Accumulator,
+    MaskedMoments,
+    MaskedPowerSpectrum,
+    MeanImage,
+)
 from aspire.source.image import ArrayImageSource, ImageSource
 from aspire.source.relion import RelionSource
 from aspire.source.simulation import Simulation
@@ -0,0 +1,118 @@
+import logging
+
+import numpy as np
+
+from aspire.numeric import fft, xp
+
+logger = logging.getLogger(__name__)
+
+
+class Accumulator:
+    """
+    Base class for statistics reduced batch by batch over the images of an `ImageSource`.
+
+    Several accumulators can share one pass over the data through `ImageSource.accumulate`.
+    """
+
+    def __init__(self):
+        self.n = 0
+
+    def push(self, im):
+        """
+        Incrementally add the contribution of a batch of images.
+
+        :param im: An `Image` object holding the next batch of images.
+        """
+        self._push(im.asnumpy())
+        self.n += im.n_images
+
+    def _push(self, images):
+        raise NotImplementedError("Subclasses implement the `_push` method.")
+
+
+class MeanImage(Accumulator):
+    """
+    Accumulate the mean of all images.
+    """
+
+    def __init__(self, L):
+        """
+        :param L: Resolution of the (square) images.
+        """
+        super().__init__()
+        self.asum = np.zeros((L, L))
+
+    def _push(self, images):
+        self.asum += np.sum(images, axis=0)
+
+    @property
+    def mean(self):
+        """
+        The mean image as an L-by-L array.
+        """
+        return self.asum / self.n
+
+
+class MaskedMoments(Accumulator):
+    """
+    Accumulate the first and second moments of pixel values in a mask.
+    """
+
+    def __init__(self, mask):
+        """
+        :param mask: An L-by-L boolean array selecting the pixels to include.
+        """
+        super().__init__()
+        self.mask = mask
+        self.asum = 0.0
+        self.asum2 = 0.0
+
+    def _push(self, images):
+        self._push_masked(images * self.mask)
+
+    def _push_masked(self, images_masked):
+        self.asum += np.sum(images_masked)
+        self.asum2 += np.sum(np.abs(images_masked ** 2))
+
+    @property
+    def size(self):
+        """
+        The number of pixels seen so far.
+        """
+        return self.n * np.sum(self.mask)
+
+    @property
+    def mean(self):
+        return self.asum / self.size
+
+    @property
+    def variance(self):
+        return self.asum2 / self.size - self.mean ** 2
+
+
+class MaskedPowerSpectrum(MaskedMoments):
+    """
+    Accumulate the mean power spectrum of images restricted to a mask, along with the moments of their pixels.
+    """
+
+    def __init__(self, mask):
+        """
+        :param mask: An L-by-L boolean array selecting the pixels to include.
+        """
+        super().__init__(mask)
+        self.psum = np.zeros(mask.shape)
+
+    def _push_masked(self, images_masked):
+        super()._push_masked(images_masked)
+        im_masked_f = xp.asnumpy(fft.centered_fft2(xp.asarray(images_masked)))
+        self.psum += np.sum(np.abs(im_masked_f ** 2), axis=0)
+
+    @property
+    def power_spectrum(self):
+        """
+        The power spectrum of the masked images with the DC component of the mean removed.
+        """
+        psd = self.psum / self.size
+        mid = self.mask.shape[0] // 2
+        psd[mid, mid] -= self.mean ** 2
+        return psd
@@ -1,23 +1,38 @@
+import json
 import logging
 import os.path
+import tempfile
+import threading
+from collections import deque
+from concurrent import futures
 
 import mrcfile
 import numpy as np
 import pandas as pd
 from scipy.spatial.transform import Rotation as R
 
+from aspire import config
 from aspire.image import Image, normalize_bg
 from aspire.image.xform import (
     Downsample,
     FilterXform,
+    IndexedFilterXform,
     IndexedXform,
     LambdaXform,
     Multiply,
     Pipeline,
 )
-from aspire.operators import LambdaFilter, MultiplicativeFilter, PowerFilter
+from aspire.operators import (
+    BatchCTFFilter,
+    IndexedFilterGrid,
+    LambdaFilter,
+    MultiplicativeFilter,
+    PowerFilter,
+    grid_cache,
+)
+from aspire.source.accumulators import MeanImage
 from aspire.storage import MrcStats, StarFile, StarFileBlock
-from aspire.utils import ensure
+from aspire.utils import ensure, group_indices
 from aspire.utils.coor_trans import grid_2d
 
 logger = logging.getLogger(__name__)
@@ -82,6 +97,17 @@ class ImageSource:
         "_rlnMaxValueProbDistribution": float,
     }
 
+    # Metadata columns backing each of the frequently accessed per-image arrays, which are kept as typed,
+    # contiguous arrays instead of being looked up in the metadata table on every access.
+    _hot_metadata_fields = {
+        "states": ["_rlnClassNumber"],
+        "filter_indices": ["__filter_indices"],
+        "offsets": ["_rlnOriginX", "_rlnOriginY"],
+        "amplitudes": ["_rlnAmplitude"],
+        "angles": ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"],
+        "rots": ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"],
+    }
+
     def __init__(self, L, n, dtype="double", metadata=None, memory=None):
         """
         A Cryo-EM ImageSource object that supplies images along with other parameters for image manipulation.
@@ -91,7 +117,8 @@ class ImageSource:
             Note that images() may return a different number of images based on its arguments.
         :param metadata: A Dataframe of metadata information corresponding to this ImageSource's images
         :param memory: str or None
-            The path of the base directory to use as a data store or None. If None is given, no caching is performed.
+            The path of the base directory under which to spill cached steps of the generation pipeline or None.
+            If None is given, steps are cached in memory only, as set in the `pipeline` section of the configuration.
         """
         self.L = L
         self.n = n
@@ -99,27 +126,41 @@ class ImageSource:
 
         # The private attribute '_cached_im' can be populated by calling this object's cache() method explicitly
         self._cached_im = None
+        # Open scratch file backing '_cached_im' when it is cached on disk
+        self._cache_file = None
+        # Read-only arrays of hot metadata, see `_hot_metadata`
+        self._hot = {}
 
         if metadata is None:
             self._metadata = pd.DataFrame([], index=pd.RangeIndex(self.n))
         else:
             self._metadata = metadata
-            if self.has_metadata(["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"]):
-                self._rotations = R.from_euler(
-                    "ZYZ",
-                    self.get_metadata(
-                        ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"]
-                    ),
-                    degrees=True,
-                )
+            self._update_rotations()
 
         self.unique_filters = []
         self.generation_pipeline = Pipeline(xforms=None, memory=memory)
         self._metadata_out = None
 
+    def _hot_metadata(self, name, compute):
+        """
+        Get a frequently accessed per-image array, computing it from the metadata on first access only.
+
+        :param name: A key of `_hot_metadata_fields`.
+        :param compute: A function computing the array from the metadata.
+        :return: A read-only ndarray, which stays valid until the metadata columns it derives from are modified.
+        """
+        value = self._hot.get(name)
+        if value is None:
+            value = np.array(compute())
+            value.setflags(write=False)
+            self._hot[name] = value
+        return value
+
     @property
     def states(self):
-        return np.atleast_1d(self.get_metadata("_rlnClassNumber"))
+        return self._hot_metadata(
+            "states", lambda: np.atleast_1d(self.get_metadata("_rlnClassNumber"))
+        )
 
     @states.setter
     def states(self, values):
@@ -127,7 +168,9 @@ class ImageSource:
 
     @property
     def filter_indices(self):
-        return self.get_metadata("__filter_indices")
+        return self._hot_metadata(
+            "filter_indices", lambda: self.get_metadata("__filter_indices")
+        )
 
     @filter_indices.setter
     def filter_indices(self, indices):
@@ -143,11 +186,19 @@ class ImageSource:
                 "Cs",
                 "alpha",
             )
-            filter_values = np.zeros((len(indices), len(attribute_list)))
-            for i, filt in enumerate(self.unique_filters):
-                filter_values[indices == i] = [
-                    getattr(filt, attribute, np.nan) for attribute in attribute_list
-                ]
+            # Parameters of each unique filter, looked up for every image
+            if isinstance(self.unique_filters, BatchCTFFilter):
+                filter_params = np.column_stack(
+                    [getattr(self.unique_filters, a) for a in attribute_list]
+                )
+            else:
+                filter_params = np.array(
+                    [
+                        [getattr(filt, a, np.nan) for a in attribute_list]
+                        for filt in self.unique_filters
+                    ]
+                ).reshape(-1, len(attribute_list))
+            filter_values = filter_params[np.asarray(indices)]
 
         self.set_metadata(
             [
@@ -164,8 +215,11 @@ class ImageSource:
 
     @property
     def offsets(self):
-        return np.atleast_2d(
-            self.get_metadata(["_rlnOriginX", "_rlnOriginY"], default_value=0.0)
+        return self._hot_metadata(
+            "offsets",
+            lambda: np.atleast_2d(
+                self.get_metadata(["_rlnOriginX", "_rlnOriginY"], default_value=0.0)
+            ),
         )
 
     @offsets.setter
@@ -174,7 +228,12 @@ class ImageSource:
 
     @property
     def amplitudes(self):
-        return np.atleast_1d(self.get_metadata("_rlnAmplitude", default_value=1.0))
+        return self._hot_metadata(
+            "amplitudes",
+            lambda: np.atleast_1d(
+                self.get_metadata("_rlnAmplitude", default_value=1.0)
+            ),
+        )
 
     @amplitudes.setter
     def amplitudes(self, values):
@@ -185,14 +244,18 @@ class ImageSource:
         """
         :return: Rotation angles in radians, as a n x 3 array
         """
-        return self._rotations.as_euler().astype(self.dtype)
+        return self._hot_metadata(
+            "angles", lambda: self._rotations.as_euler("ZYZ").astype(self.dtype)
+        )
 
     @property
     def rots(self):
         """
         :return: Rotation matrices as a n x 3 x 3 array
         """
-        return self._rotations.as_matrix().astype(self.dtype)
+        return self._hot_metadata(
+            "rots", lambda: self._rotations.as_matrix().astype(self.dtype)
+        )
 
     @angles.setter
     def angles(self, values):
@@ -201,10 +264,11 @@ class ImageSource:
         :param values: Rotation angles in radians, as a n x 3 array
         :return: None
         """
-        self._rotations = R.from_euler("ZYZ", values)
         self.set_metadata(
             ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"], np.rad2deg(values)
         )
+        # Exact, rather than rebuilt from the angles in degrees
+        self._rotations = R.from_euler("ZYZ", values)
 
     @rots.setter
     def rots(self, values):
@@ -213,11 +277,25 @@ class ImageSource:
         :param values: Rotation matrices as a n x 3 x 3 array
         :return: None
         """
-        self._rotations = R.from_matrix(values)
+        rotations = R.from_matrix(values)
         self.set_metadata(
             ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"],
-            self._rotations.as_euler("ZYZ", degrees=True),
+            rotations.as_euler("ZYZ", degrees=True),
         )
+        self._rotations = rotations
+
+    def _update_rotations(self):
+        """
+        Rebuild the rotations from the angle columns of the metadata, if they are all present.
+        """
+        if self.has_metadata(["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"]):
+            self._rotations = R.from_euler(
+                "ZYZ",
+                self.get_metadata(
+                    ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"]
+                ).reshape(-1, 3),
+                degrees=True,
+            )
 
     def set_metadata(self, metadata_fields, values, indices=None):
         """
@@ -247,6 +325,19 @@ class ImageSource:
             else:
                 self._metadata[metadata_field] = series
 
+        if not {"_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"}.isdisjoint(
+            metadata_fields
+        ):
+            self._update_rotations()
+
+        # Drop hot arrays derived from the modified columns, they are recomputed on next access
+        for name, fields in self._hot_metadata_fields.items():
+            if name in self._hot and not set(fields).isdisjoint(metadata_fields):
+                del self._hot[name]
+
+        # Images may depend on metadata, so previously cached pipeline steps can no longer be trusted
+        self.generation_pipeline.clear_cache()
+
     def has_metadata(self, metadata_fields):
         """
         Find out if one more more metadata fields are available for this `ImageSource`.
@@ -325,35 +416,115 @@ class ImageSource:
         if indices is None:
             indices = np.arange(start, min(start + num, self.n))
 
-        for i, filt in enumerate(self.unique_filters):
-            idx_k = np.where(self.filter_indices[indices] == i)[0]
-            if len(idx_k) > 0:
-                im[idx_k] = Image(im[idx_k]).filter(filt).asnumpy()
+        if not self.unique_filters:
+            return im
+
+        if isinstance(self.unique_filters, BatchCTFFilter):
+            # All filters of the batch are evaluated at once
+            xform = IndexedFilterXform(self.unique_filters, self.filter_indices)
+            return xform.forward(im, indices)
+
+        # Only the filters of images in this batch are visited
+        for i, idx_k in group_indices(self.filter_indices[indices]):
+            im[idx_k] = Image(im[idx_k]).filter(self.unique_filters[i]).asnumpy()
 
         return im
 
     def eval_filter_grid(self, L, power=1):
-        grid2d = grid_2d(L, dtype=self.dtype)
-        omega = np.pi * np.vstack((grid2d["x"].flatten(), grid2d["y"].flatten()))
+        """
+        Evaluate the filter of every image on an L-by-L grid.
 
-        h = np.empty((omega.shape[-1], len(self.filter_indices)), dtype=self.dtype)
-        for i, filt in enumerate(self.unique_filters):
-            idx_k = np.where(self.filter_indices == i)[0]
-            if len(idx_k) > 0:
-                filter_values = filt.evaluate(omega)
-                if power != 1:
-                    filter_values **= power
-                h[:, idx_k] = np.column_stack((filter_values,) * len(idx_k))
+        :param L: Resolution of the grid.
+        :param power: Power to which filter values are raised.
+        :return: An `IndexedFilterGrid` of shape (L, L, n), holding one grid per distinct filter of the images.
+        """
+        # Only filters used by some image are evaluated
+        labels, indices = np.unique(self.filter_indices, return_inverse=True)
+        if isinstance(self.unique_filters, BatchCTFFilter):
+            grid2d = grid_2d(L, dtype=self.dtype)
+            omega = np.pi * np.vstack((grid2d["x"].flatten(), grid2d["y"].flatten()))
+            grids = np.reshape(
+                self.unique_filters[labels].evaluate(omega).T, (L, L, len(labels))
+            )
+        else:
+            # Shares the grids `Image.filter` evaluates for the same filters
+            grids = np.stack(
+                [
+                    self.unique_filters[i].evaluate_grid(L, dtype=self.dtype)
+                    for i in labels
+                ],
+                axis=-1,
+            )
+        if power != 1:
+            grids **= power
 
-        h = np.reshape(h, grid2d["x"].shape + (len(self.filter_indices),))
+        grids = grids.astype(self.dtype, copy=False)
 
-        return h
+        return IndexedFilterGrid(grids, indices)
 
-    def cache(self):
-        logger.info("Caching source images")
-        self._cached_im = self.images(start=0, num=np.inf)
+    def cache(self, mode=None, scratch_dir=None, batch_size=512):
+        """
+        Apply the generation pipeline to all images once, and serve subsequent `images` calls from the result.
+
+        :param mode: 'memory' to hold the images in RAM, or 'disk' to write them to a memory-mapped scratch file.
+            If None, the value from the `source` section of the configuration is used.
+        :param scratch_dir: Directory in which to create the scratch file of a disk cache.
+            If None, the value from the `source` section of the configuration is used, falling back to the
+            system temporary directory.
+        :param batch_size: Number of images processed at a time while filling a disk cache.
+        :return: None
+        """
+        if mode is None:
+            mode = config.source.cache
+        ensure(mode in ("memory", "disk"), f"Unknown cache mode {mode}")
+
+        logger.info(f"Caching source images in {mode}")
+        if mode == "memory":
+            cached_im = self.images(start=0, num=np.inf)
+            self._clear_cache()
+            self._cached_im = cached_im
+        else:
+            self._cache_to_disk(scratch_dir, batch_size)
         self.generation_pipeline.reset()
 
+    def _cache_to_disk(self, scratch_dir, batch_size):
+        if scratch_dir is None:
+            scratch_dir = config.source.cache_dir or None
+
+        # Integer sources are cached in single precision, since the pipeline may not preserve integers.
+        dtype = self.dtype if self.dtype.kind == "f" else np.dtype("float32")
+        shape = (self.n, self.L, self.L)
+
+        # The scratch file has no name on disk on most platforms,
+        # and is removed once it is closed or garbage collected.
+        f = tempfile.TemporaryFile(prefix="aspire_cache_", dir=scratch_dir)
+        try:
+            f.truncate(self.n * self.L * self.L * dtype.itemsize)
+            cached_im = np.memmap(f, dtype=dtype, mode="r+", shape=shape)
+            for i, im in zip(
+                range(0, self.n, batch_size), self.iter_batches(batch_size)
+            ):
+                cached_im[i : i + im.n_images] = im.asnumpy()
+            cached_im.flush()
+            del cached_im
+        except BaseException:
+            f.close()
+            raise
+
+        self._clear_cache()
+        self._cache_file = f
+        # Served read-only, so that no caller can modify the cache through the views returned by `images`
+        self._cached_im = np.memmap(f, dtype=dtype, mode="r", shape=shape)
+        logger.info(
+            f"Cached {self.n} images ({self._cached_im.nbytes} bytes) in scratch file"
+        )
+
+    def _clear_cache(self):
+        self._cached_im = None
+        if self._cache_file is not None:
+            self._cache_file.close()
+            self._cache_file = None
+
     def images(self, start, num, *args, **kwargs):
         """
         Return images from this ImageSource as an Image object.
@@ -365,7 +536,16 @@ class ImageSource:
         """
         indices = np.arange(start, min(start + num, self.n), dtype=np.int)
 
-        if self._cached_im is not None:
+        im = self.generation_pipeline.cached(indices)
+        if im is not None:
+            logger.info(f"Loaded {len(indices)} images from pipeline cache")
+            return im
+
+        if isinstance(self._cached_im, np.memmap):
+            logger.info("Loading images from disk cache")
+            # Consecutive images are a view on the memory map, no copy is made.
+            im = Image(self._cached_im[start : start + len(indices)])
+        elif self._cached_im is not None:
             logger.info("Loading images from cache")
             im = Image(self._cached_im[indices, :, :])
         else:
@@ -375,6 +555,87 @@ class ImageSource:
         logger.info(f"Loaded {len(indices)} images")
         return im
 
+    def iter_batches(
+        self, batch_size=512, start=0, num=np.inf, prefetch=None, workers=None
+    ):
+        """
+        Generate consecutive batches of images from this ImageSource.
+
+        Upcoming batches are loaded, and passed through the generation pipeline, on background
+        threads while the caller works on the current batch.
+
+        :param batch_size: Number of images in each batch. The last batch may be smaller.
+        :param start: The inclusive start index of the first batch.
+        :param num: The total number of images to generate.
+        :param prefetch: Number of batches to load ahead of the one being consumed.
+            0 loads each batch synchronously on request.
+            If None, the value from the `source` section of the configuration is used.
+        :param workers: Number of background threads loading batches.
+            If None, the value from the `source` section of the configuration is used.
+        :return: A generator of `Image` objects; batch `k` holds images `start + k * batch_size` onwards.
+        """
+        end = min(start + num, self.n)
+        batches = [(i, min(batch_size, end - i)) for i in range(start, end, batch_size)]
+        return self._prefetch_images(batches, prefetch=prefetch, workers=workers)
+
+    def accumulate(self, accumulators, batch_size=512, start=0, num=np.inf):
+        """
+        Push images from this ImageSource to several accumulators in a single pass.
+
+        :param accumulators: An iterable of `Accumulator` objects.
+        :param batch_size: Number of images read at a time.
+        :param start: The inclusive start index of images to accumulate.
+        :param num: The number of images to accumulate.
+        :return: The list of accumulators, which have been updated in place.
+        """
+        accumulators = list(accumulators)
+        logger.info(
+            f"Accumulating {', '.join(type(a).__name__ for a in accumulators)}"
+            f" in batches of {batch_size}"
+        )
+        for images in self.iter_batches(batch_size, start=start, num=num):
+            for accumulator in accumulators:
+                accumulator.push(images)
+
+        return accumulators
+
+    def _prefetch_images(self, batches, prefetch=None, workers=None):
+        """
+        Generate `images(start, num)` for each (start, num) pair in `batches`, in order,
+        keeping up to `prefetch` batches in flight on `workers` background threads.
+        """
+        if prefetch is None:
+            prefetch = config.source.prefetch
+        if workers is None:
+            workers = config.source.prefetch_workers
+
+        if prefetch <= 0:
+            for start, num in batches:
+                yield self.images(start, num)
+            return
+
+        batches = iter(batches)
+        pending = deque()
+        with futures.ThreadPoolExecutor(max(1, workers)) as executor:
+
+            def submit_next():
+                batch = next(batches, None)
+                if batch is not None:
+                    pending.append(executor.submit(self.images, *batch))
+
+            try:
+                # The batch being consumed, plus `prefetch` more
+                for _ in range(prefetch + 1):
+                    submit_next()
+
+                while pending:
+                    yield pending.popleft().result()
+                    submit_next()
+            finally:
+                # The consumer may stop early; don't load batches nobody will ask for.
+                for future in pending:
+                    future.cancel()
+
     def downsample(self, L):
         ensure(
             L <= self.L,
@@ -382,14 +643,28 @@ class ImageSource:
         )
         logger.info(f"Setting max. resolution of source = {L}")
 
-        self.generation_pipeline.add_xform(Downsample(resolution=L))
+        self._downsample_images(L)
 
         ds_factor = self.L / L
-        self.unique_filters = [f.scale(ds_factor) for f in self.unique_filters]
-        self.offsets /= ds_factor
+        if isinstance(self.unique_filters, BatchCTFFilter):
+            self.unique_filters = self.unique_filters.scale(ds_factor)
+        else:
+            # Grids of the unscaled filters won't be asked for again
+            for f in self.unique_filters:
+                grid_cache.invalidate(f)
+            self.unique_filters = [f.scale(ds_factor) for f in self.unique_filters]
+        self.offsets = self.offsets / ds_factor
 
         self.L = L
 
+    def _downsample_images(self, L):
+        """
+        Arrange for images to be downsampled to resolution L, by appending a `Downsample` Xform to the generation
+        pipeline. Subclasses may instead downsample images as they are loaded.
+        :param L: The new resolution.
+        """
+        self.generation_pipeline.add_xform(Downsample(resolution=L))
+
     def whiten(self, noise_filter):
         """
         Modify the `ImageSource` in-place by appending a whitening filter to the generation pipeline.
@@ -413,6 +688,11 @@ class ImageSource:
         """
         logger.info("Perform phase flip on source object")
         logger.info("Adding Phase Flip Xform to end of generation pipeline")
+        if isinstance(self.unique_filters, BatchCTFFilter):
+            self.generation_pipeline.add_xform(
+                IndexedFilterXform(self.unique_filters, self.filter_indices, np.sign)
+            )
+            return
         unique_xforms = [
             FilterXform(LambdaFilter(f, np.sign)) for f in self.unique_filters
         ]
@@ -420,7 +700,7 @@ class ImageSource:
             IndexedXform(unique_xforms, self.filter_indices)
         )
 
-    def invert_contrast(self, batch_size=512):
+    def invert_contrast(self, batch_size=512, mean_image=None):
         """
         invert the global contrast of images
 
@@ -433,30 +713,25 @@ class ImageSource:
         appending a `Multiple` filter to the generation pipeline.
 
         :param batch_size: Batch size of images to query.
+        :param mean_image: The mean of all images of this source as an L-by-L array, if it is already known
+            (for example from a `MeanImage` accumulator). If None, it is computed in a pass over the images.
         :return: On return, the `ImageSource` object has been modified in place.
         """
 
         logger.info("Apply contrast inversion on source object")
+        if mean_image is None:
+            (accumulator,) = self.accumulate([MeanImage(self.L)], batch_size)
+            mean_image = accumulator.mean
+
         L = self.L
         grid = grid_2d(L, shifted=True)
         # Get mask indices of signal and noise samples assuming molecule
         signal_mask = grid["r"] < 0.5
         noise_mask = grid["r"] > 0.8
 
-        # Calculate mean values in batch_size
-        signal_mean = 0.0
-        noise_mean = 0.0
-
-        for i in range(0, self.n, batch_size):
-            images = self.images(i, batch_size).asnumpy()
-            signal = images * signal_mask
-            noise = images * noise_mask
-            signal_mean += np.sum(signal)
-            noise_mean += np.sum(noise)
-        signal_denominator = self.n * np.sum(signal_mask)
-        noise_denominator = self.n * np.sum(noise_mask)
-        signal_mean /= signal_denominator
-        noise_mean /= noise_denominator
+        # Mean values over all images follow from the mean image
+        signal_mean = np.sum(mean_image * signal_mask) / np.sum(signal_mask)
+        noise_mean = np.sum(mean_image * noise_mask) / np.sum(noise_mask)
 
         if signal_mean < noise_mean:
             logger.info("Need to invert contrast")
@@ -537,6 +812,8 @@ class ImageSource:
         batch_size=512,
         save_mode=None,
         overwrite=False,
+        resume=False,
+        dtype="float32",
     ):
         """
         Save the output metadata to STAR file and/or images to MRCS file
@@ -546,6 +823,8 @@ class ImageSource:
         :param batch_size: Batch size of images to query.
         :param save_mode: Whether to save all images in a single or multiple files in batch size.
         :param overwrite: Option to overwrite the output MRCS files.
+        :param resume: Whether to skip images already saved by an earlier, interrupted call. See `save_images`.
+        :param dtype: Data type of the saved images. See `save_images`.
         """
         logger.info("save metadata into STAR file")
         filename_indices = self.save_metadata(
@@ -561,10 +840,17 @@ class ImageSource:
             filename_indices=filename_indices,
             batch_size=batch_size,
             overwrite=overwrite,
+            resume=resume,
+            dtype=dtype,
         )
 
     def save_metadata(
-        self, starfile_filepath, new_mrcs=True, batch_size=512, save_mode=None
+        self,
+        starfile_filepath,
+        new_mrcs=True,
+        batch_size=512,
+        save_mode=None,
+        float_precision=None,
     ):
         """
         Save updated metadata to a STAR file
@@ -578,6 +864,9 @@ class ImageSource:
             written to STAR file.
         :param save_mode: Whether to save all images in a single or
             multiple files in batch size.
+        :param float_precision: Optional number of digits after the decimal
+            point written for floating point metadata. Defaults to the shortest
+            representation that round-trips.
         :return: None
         """
 
@@ -636,12 +925,19 @@ class ImageSource:
 
             # initial the star file object and save it
             starfile = StarFile(blocks=[StarFileBlock(loops=[df])])
-            starfile.save(f)
+            starfile.save(f, float_precision=float_precision)
 
         return filename_indices
 
     def save_images(
-        self, starfile_filepath, filename_indices=None, batch_size=512, overwrite=False
+        self,
+        starfile_filepath,
+        filename_indices=None,
+        batch_size=512,
+        overwrite=False,
+        resume=False,
+        writers=None,
+        dtype="float32",
     ):
 
         """
@@ -649,11 +945,20 @@ class ImageSource:
 
         Note that .mrcs files are saved at the same location as the STAR file.
 
+        Batches are written on background threads while the next ones are computed. Completed batches are recorded in
+        a checkpoint file next to the STAR file, which is removed once all images have been saved.
+
         :param filename_indices: Filename list for save all images
         :param starfile_filepath: Path to STAR file where we want to save image_source
         :param batch_size: Batch size of images to query from the `ImageSource` object.
             if `save_mode` is not `single`, images in the same batch will save to one MRCS file.
         :param overwrite: Whether to overwrite any .mrcs files found at the target location.
+        :param resume: Whether to skip batches recorded as saved in the checkpoint file of an earlier,
+            interrupted call with the same arguments. If no such checkpoint exists, all images are saved.
+        :param writers: Number of threads writing batches to separate .mrcs files.
+            If None, the value from the `source` section of the configuration is used.
+        :param dtype: Data type of the saved images, "float32" (MRC mode 2, default) or "float16" (MRC mode 12),
+            which halves the size of the files at the cost of precision.
         :return: None
         """
 
@@ -662,6 +967,13 @@ class ImageSource:
             filename_indices = [
                 self._metadata["_rlnImageName"][i].split("@")[1] for i in range(self.n)
             ]
+        if writers is None:
+            writers = config.source.save_writers
+        dtype = np.dtype(dtype)
+        ensure(
+            dtype in (np.float32, np.float16),
+            f"Images can only be saved as float32 or float16, not {dtype}.",
+        )
 
         # get the save_mode from the file names
         unique_filename = set(filename_indices)
@@ -669,6 +981,45 @@ class ImageSource:
         if len(unique_filename) == 1:
             save_mode = "single"
 
+        batch_starts = list(range(0, self.n, batch_size))
+        checkpoint = _SaveCheckpoint(
+            f"{starfile_filepath}.checkpoint",
+            {
+                "n": self.n,
+                "L": self.L,
+                "batch_size": batch_size,
+                "dtype": dtype.name,
+                "files": sorted(unique_filename),
+            },
+        )
+        saved = checkpoint.load() if resume else None
+        # Files left by an interrupted call of this same save are ours to replace
+        resuming = saved is not None
+        done = saved or set()
+        if not (overwrite or resuming):
+            # Refuse before a checkpoint is started, which would let a later resumed call replace these files
+            fdir = os.path.dirname(starfile_filepath)
+            for fname in sorted(unique_filename):
+                mrcs_filepath = os.path.join(fdir, fname)
+                if os.path.exists(mrcs_filepath):
+                    raise ValueError(
+                        f"File '{mrcs_filepath}' already exists; set overwrite=True to overwrite it"
+                    )
+        if save_mode == "single" and not os.path.exists(
+            os.path.join(os.path.dirname(starfile_filepath), filename_indices[0])
+        ):
+            done = set()
+        if done:
+            logger.info(
+                f"Resuming save, {len(done)} of {len(batch_starts)} batches already saved"
+            )
+        checkpoint.start(done)
+        batches = [
+            (i_start, min(batch_size, self.n - i_start))
+            for i_start in batch_starts
+            if i_start not in done
+        ]
+
         if save_mode == "single":
             # Save all images into one single mrc file
 
@@ -676,29 +1027,43 @@ class ImageSource:
             fdir = os.path.dirname(starfile_filepath)
             mrcs_filepath = os.path.join(fdir, filename_indices[0])
 
-            # Open new MRC file
-            with mrcfile.new_mmap(
-                mrcs_filepath,
-                shape=(self.n, self.L, self.L),
-                mrc_mode=2,
-                overwrite=overwrite,
-            ) as mrc:
+            if done:
+                # Reopen the file written by the interrupted call
+                mrc = mrcfile.mmap(mrcs_filepath, mode="r+")
+            else:
+                # Open new MRC file
+                mrc = mrcfile.new_mmap(
+                    mrcs_filepath,
+                    shape=(self.n, self.L, self.L),
+                    mrc_mode=mrcfile.utils.mode_from_dtype(dtype),
+                    overwrite=overwrite or resuming,
+                )
 
+            with mrc:
                 stats = MrcStats()
+                # Statistics of saved batches are read back rather than recomputed
+                for i_start in sorted(done):
+                    stats.push(mrc.data[i_start : i_start + batch_size])
+
+                def write(i_start, datum):
+                    mrc.data[i_start : i_start + len(datum)] = datum
+                    mrc.flush()
+
                 # Loop over source setting data into mrc file
-                for i_start in np.arange(0, self.n, batch_size):
-                    i_end = min(self.n, i_start + batch_size)
-                    num = i_end - i_start
-                    logger.info(
-                        f"Saving ImageSource[{i_start}-{i_end-1}] to {mrcs_filepath}"
-                    )
-                    datum = self.images(start=i_start, num=num).data.astype("float32")
+                with _WriteBehind(1, checkpoint) as writer:
+                    for (i_start, num), im in zip(
+                        batches, self._prefetch_images(batches)
+                    ):
+                        logger.info(
+                            f"Saving ImageSource[{i_start}-{i_start + num - 1}] to {mrcs_filepath}"
+                        )
+                        datum = im.data.astype(dtype)
 
-                    # Assign to mrcfile
-                    mrc.data[i_start:i_end] = datum
+                        # Accumulate stats
+                        stats.push(datum)
 
-                    # Accumulate stats
-                    stats.push(datum)
+                        # Assign to mrcfile
+                        writer.submit(i_start, write, i_start, datum)
 
                 # To be safe, explicitly set the header
                 #   before the mrc file context closes.
@@ -711,19 +1076,118 @@ class ImageSource:
 
         else:
             # save all images into multiple mrc files in batch size
-            for i_start in np.arange(0, self.n, batch_size):
-                i_end = min(self.n, i_start + batch_size)
-                num = i_end - i_start
+            with _WriteBehind(writers, checkpoint) as writer:
+                for (i_start, num), im in zip(batches, self._prefetch_images(batches)):
+                    mrcs_filepath = os.path.join(
+                        os.path.dirname(starfile_filepath), filename_indices[i_start]
+                    )
 
-                mrcs_filepath = os.path.join(
-                    os.path.dirname(starfile_filepath), filename_indices[i_start]
-                )
+                    logger.info(
+                        f"Saving ImageSource[{i_start}-{i_start + num - 1}] to {mrcs_filepath}"
+                    )
+                    writer.submit(
+                        i_start,
+                        im.save,
+                        mrcs_filepath,
+                        overwrite=overwrite or resuming,
+                        dtype=dtype,
+                    )
 
-                logger.info(
-                    f"Saving ImageSource[{i_start}-{i_end-1}] to {mrcs_filepath}"
-                )
-                im = self.images(start=i_start, num=num)
-                im.save(mrcs_filepath, overwrite=overwrite)
+        checkpoint.remove()
+
+
+class _SaveCheckpoint:
+    """
+    A file recording which batches of an `ImageSource.save_images` call have been written.
+
+    The first line describes the call, and each further line holds the start index of a saved batch.
+    """
+
+    def __init__(self, filepath, header):
+        self.filepath = filepath
+        self.header = header
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        :return: The set of start indices of saved batches, or None if there is no checkpoint matching this call.
+        """
+        if not os.path.exists(self.filepath):
+            return None
+        with open(self.filepath) as f:
+            lines = f.read().splitlines()
+        try:
+            if not lines or json.loads(lines[0]) != self.header:
+                logger.info(f"Ignoring checkpoint {self.filepath} of a different save")
+                return None
+            # A line cut short by the interruption is not a saved batch
+            return {int(line) for line in lines[1:] if line.strip().isdigit()}
+        except ValueError:
+            logger.warning(f"Ignoring unreadable checkpoint {self.filepath}")
+            return None
+
+    def start(self, done):
+        """
+        Write a new checkpoint holding the batches in `done`.
+        """
+        with open(self.filepath, "w") as f:
+            f.write(json.dumps(self.header) + "\n")
+            f.writelines(f"{i_start}\n" for i_start in sorted(done))
+
+    def mark(self, i_start):
+        """
+        Record the batch starting at `i_start` as saved.
+        """
+        with self._lock, open(self.filepath, "a") as f:
+            f.write(f"{i_start}\n")
+
+    def remove(self):
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+class _WriteBehind:
+    """
+    Run batch writes on background threads, recording each in a `_SaveCheckpoint` once it completes.
+
+    At most `workers` writes are queued beyond those in progress, so that batches waiting to be written
+    do not pile up in memory when writing is slower than computing them.
+    """
+
+    def __init__(self, workers, checkpoint):
+        self.workers = max(1, workers)
+        self.checkpoint = checkpoint
+        self._executor = futures.ThreadPoolExecutor(self.workers)
+        self._pending = deque()
+
+    def _write(self, i_start, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+        self.checkpoint.mark(i_start)
+
+    def submit(self, i_start, fn, *args, **kwargs):
+        """
+        Call `fn(*args, **kwargs)` on a writer thread, then mark the batch starting at `i_start` as saved.
+        """
+        while len(self._pending) >= 2 * self.workers:
+            self._pending.popleft().result()
+        self._pending.append(
+            self._executor.submit(self._write, i_start, fn, *args, **kwargs)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            # Let writes in progress finish, raising the first error, if any
+            while self._pending:
+                future = self._pending.popleft()
+                if exc_type is None:
+                    future.result()
+                else:
+                    future.exception()
+        finally:
+            self._executor.shutdown(wait=True)
 
 
 class ArrayImageSource(ImageSource):
@@ -1,21 +1,57 @@
+import logging
+
+import mrcfile
 import numpy as np
 
 from aspire.image import Image
 from aspire.source import ImageSource
-from aspire.storage import Micrograph
+
+logger = logging.getLogger(__name__)
 
 
 class MrcStack(ImageSource):
-    def __init__(self, filepath, dtype=np.float32):
-        self.im = Micrograph(filepath, square=True).im
+    def __init__(self, filepath, dtype=np.float32, permissive=False):
+        """
+        An `ImageSource` serving the images of a single MRC stack.
+
+        The file is memory-mapped rather than read, so only the images requested from `images` are ever loaded.
+        Non-square images are cropped to a square at their top left corner.
+
+        :param filepath: Path to the .mrc/.mrcs file.
+        :param dtype: dtype to cast images to as they are loaded, or None to keep the dtype of the file.
+        :param permissive: Whether to open files with invalid headers, as `mrcfile` allows.
+        """
+        self.filepath = filepath
+        self._mrc = mrcfile.mmap(filepath, mode="r", permissive=permissive)
+
+        data = self._mrc.data
+        if data.ndim == 2:
+            data = data[np.newaxis, :, :]
+        side_length = min(data.shape[-2], data.shape[-1])
+        self._data = data[:, :side_length, :side_length]
+
+        if dtype is None:
+            dtype = self._data.dtype
+        elif np.dtype(dtype) != self._data.dtype:
+            logger.info(
+                f"MrcStack casting {filepath} data to {np.dtype(dtype)} from {self._data.dtype} as it is loaded."
+            )
 
         super().__init__(
-            L=self.im.res,
-            n=self.im.n_images,
+            L=side_length,
+            n=self._data.shape[0],
             dtype=dtype,
         )
 
+    def close(self):
+        """
+        Close the underlying file. No images can be loaded afterwards.
+        """
+        self._mrc.close()
+
     def _images(self, start=0, num=np.inf, indices=None):
         if indices is None:
             indices = np.arange(start, min(start + num, self.n))
-        return Image(self.im[indices, :, :])
+        # Indexing copies the requested images out of the memory map
+        im = self._data[indices, :, :]
+        return Image(im.astype(self.dtype, copy=False))
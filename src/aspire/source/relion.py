@@ -1,3 +1,5 @@
+import hashlib
+import json
 import logging
 import os.path
 from concurrent import futures
@@ -7,16 +9,30 @@ import mrcfile
 import numpy as np
 import pandas as pd
 
+from aspire import config
 from aspire.image import Image
-from aspire.operators import CTFFilter
+from aspire.operators import BatchCTFFilter
 from aspire.source import ImageSource
-from aspire.storage import StarFile
+from aspire.storage import MrcFilePool, StarFile
 from aspire.utils import ensure
 
 logger = logging.getLogger(__name__)
 
 
 class RelionSource(ImageSource):
+    # Metadata fields from which the unique CTFs of a BatchCTFFilter are built
+    _ctf_fields = [
+        "_rlnVoltage",
+        "_rlnDefocusU",
+        "_rlnDefocusV",
+        "_rlnDefocusAngle",
+        "_rlnSphericalAberration",
+        "_rlnAmplitudeContrast",
+    ]
+
+    # Bumped whenever the contents of the metadata cache change
+    _metadata_cache_version = 1
+
     @classmethod
     def starfile2df(cls, filepath, data_folder=None, max_rows=None):
         if data_folder is not None:
@@ -27,9 +43,15 @@ class RelionSource(ImageSource):
 
         # Note: Valid Relion image "_data.star" files have to have their data in the first loop of the first block.
         # We thus index our StarFile class with [0][0].
-        df = StarFile(filepath)[0][0]
-        column_types = {name: cls.metadata_fields.get(name, str) for name in df.columns}
-        df = df.astype(column_types)
+        # Known fields are typed while parsing; anything the parser left as strings is cast here.
+        df = StarFile(filepath, column_types=cls.metadata_fields)[0][0]
+        column_types = {}
+        for name in df.columns:
+            _type = cls.metadata_fields.get(name, str)
+            if _type is not str and df[name].dtype != np.dtype(_type):
+                column_types[name] = _type
+        if column_types:
+            df = df.astype(column_types)
 
         df[["__mrc_index", "__mrc_filename"]] = df["_rlnImageName"].str.split(
             "@", 1, expand=True
@@ -47,6 +69,107 @@ class RelionSource(ImageSource):
         else:
             return df.iloc[:max_rows]
 
+    @staticmethod
+    def _probe_mrc(filepath):
+        """
+        Read the data mode and image size of a .mrcs file from its header alone.
+
+        :param filepath: Path to .mrcs file.
+        :return: A tuple (mode, L).
+        """
+        with mrcfile.open(filepath, header_only=True) as mrc:
+            mode = int(mrc.header.mode)
+            nx, ny = int(mrc.header.nx), int(mrc.header.ny)
+        ensure(nx == ny, "Only square images are supported")
+        return mode, nx
+
+    @staticmethod
+    def _starfile_key(filepath):
+        stat = os.stat(filepath)
+        return {
+            "starfile": os.path.abspath(filepath),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    @classmethod
+    def _metadata_cache_path(cls, cache_dir, filepath, data_folder, max_rows):
+        """
+        Name the sidecar file for a STAR file and the arguments used to read it.
+        """
+        key = f"{os.path.abspath(filepath)}|{data_folder}|{max_rows}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        fname = os.path.splitext(os.path.basename(filepath))[0]
+        return os.path.join(cache_dir, f"{fname}.{digest}.npz")
+
+    @classmethod
+    def _save_metadata_cache(
+        cls, cache_filepath, filepath, metadata, filter_params, filter_indices, mode, L
+    ):
+        """
+        Save parsed metadata, unique CTF parameters and image geometry to a sidecar file.
+
+        Each metadata column is stored as its own array; string columns are stored as fixed width unicode.
+        """
+        key = dict(cls._starfile_key(filepath), version=cls._metadata_cache_version)
+        arrays = {
+            "key": np.array(json.dumps(key, sort_keys=True)),
+            "columns": np.array(metadata.columns, dtype=str),
+            "object_columns": np.array(metadata.dtypes == object),
+            "filter_params": filter_params,
+            "filter_indices": filter_indices,
+            "geometry": np.array([mode, L]),
+        }
+        for i, col in enumerate(metadata.columns):
+            values = metadata[col].values
+            if values.dtype == object:
+                values = values.astype(str)
+            arrays[f"column_{i}"] = values
+
+        os.makedirs(os.path.dirname(cache_filepath) or ".", exist_ok=True)
+        # Write to a temporary name first so readers never see a partial sidecar
+        tmp_filepath = f"{cache_filepath}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_filepath, **arrays)
+        os.replace(tmp_filepath, cache_filepath)
+        logger.info(f"Saved metadata cache {cache_filepath}")
+
+    @classmethod
+    def _load_metadata_cache(cls, cache_filepath, filepath):
+        """
+        Load a sidecar saved by `_save_metadata_cache`.
+
+        :return: A tuple (metadata, filter_params, filter_indices, mode, L),
+            or None if no sidecar exists or it is stale.
+        """
+        if not os.path.exists(cache_filepath):
+            return None
+
+        key = dict(cls._starfile_key(filepath), version=cls._metadata_cache_version)
+        try:
+            with np.load(cache_filepath, allow_pickle=False) as f:
+                if json.loads(str(f["key"])) != key:
+                    logger.info(f"Metadata cache {cache_filepath} is stale")
+                    return None
+
+                columns = f["columns"].tolist()
+                object_columns = f["object_columns"]
+                data = {}
+                for i, col in enumerate(columns):
+                    values = f[f"column_{i}"]
+                    if object_columns[i]:
+                        values = values.astype(object)
+                    data[col] = values
+                metadata = pd.DataFrame(data, columns=columns)
+                filter_params = f["filter_params"]
+                filter_indices = f["filter_indices"]
+                mode, L = (int(x) for x in f["geometry"])
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Could not read metadata cache {cache_filepath}: {e}")
+            return None
+
+        logger.info(f"Loaded metadata cache {cache_filepath}")
+        return metadata, filter_params, filter_indices, mode, L
+
     def __init__(
         self,
         filepath,
@@ -56,6 +179,8 @@ class RelionSource(ImageSource):
         n_workers=-1,
         max_rows=None,
         memory=None,
+        max_open_files=None,
+        metadata_cache=None,
     ):
         """
         Load STAR file at given filepath
@@ -69,7 +194,14 @@ class RelionSource(ImageSource):
             Note that this refers to the max number of images to load, not the max. number of .mrcs files (which may be
             equal to or less than the number of images).
         :param memory: str or None
-            The path of the base directory to use as a data store or None. If None is given, no caching is performed.
+            The path of the base directory under which to spill cached steps of the generation pipeline or None.
+            If None is given, steps are cached in memory only, as set in the `pipeline` section of the configuration.
+        :param max_open_files: Maximum number of referenced .mrcs files to keep open (memory-mapped) between reads.
+            If None, the value from the `starfile` section of the configuration is used.
+        :param metadata_cache: str or None
+            The path of a directory in which to keep a binary sidecar of the parsed metadata, unique CTF parameters
+            and image geometry for this STAR file, or None. If None is given, the STAR file is parsed every time.
+            The sidecar is rebuilt whenever the STAR file's size or modification time changes.
         """
         logger.debug(f"Creating ImageSource from STAR file at path {filepath}")
 
@@ -77,62 +209,77 @@ class RelionSource(ImageSource):
         self.B = B
         self.n_workers = n_workers
 
-        metadata = self.__class__.starfile2df(filepath, data_folder, max_rows)
+        if max_open_files is None:
+            max_open_files = config.starfile.max_open_files
+        # Handles to referenced .mrcs files are shared by all calls to _images
+        self._mrc_pool = MrcFilePool(max_open=max_open_files)
 
-        n = len(metadata)
-        if n == 0:
-            raise RuntimeError("No mrcs files found for starfile!")
+        cache_filepath = None
+        cached = None
+        if metadata_cache is not None:
+            cache_filepath = self._metadata_cache_path(
+                metadata_cache, filepath, data_folder, max_rows
+            )
+            cached = self._load_metadata_cache(cache_filepath, filepath)
+
+        if cached is not None:
+            metadata, filter_params, filter_indices, mode, L = cached
+        else:
+            metadata = self.__class__.starfile2df(filepath, data_folder, max_rows)
+
+            if len(metadata) == 0:
+                raise RuntimeError("No mrcs files found for starfile!")
+
+            # Peek into the header of the first .mrcs file to populate some attributes
+            mode, L = self._probe_mrc(metadata.loc[0]["__mrc_filepath"])
+
+            filter_params, filter_indices = np.unique(
+                metadata[self._ctf_fields].values,
+                return_inverse=True,
+                axis=0,
+            )
+
+            if cache_filepath is not None:
+                self._save_metadata_cache(
+                    cache_filepath,
+                    filepath,
+                    metadata,
+                    filter_params,
+                    filter_indices,
+                    mode,
+                    L,
+                )
 
-        # Peek into the first image and populate some attributes
-        first_mrc_filepath = metadata.loc[0]["__mrc_filepath"]
-        mrc = mrcfile.open(first_mrc_filepath)
+        n = len(metadata)
 
-        # Get the 'mode' (data type) - TODO: There's probably a more direct way to do this.
-        mode = int(mrc.header.mode)
-        dtypes = {0: "int8", 1: "int16", 2: "float32", 6: "uint16"}
+        # Half precision (mode 12) images are upcast to single precision as they are read
+        dtypes = {0: "int8", 1: "int16", 2: "float32", 6: "uint16", 12: "float32"}
         ensure(
             mode in dtypes,
             f"Only modes={list(dtypes.keys())} in MRC files are supported for now.",
         )
         dtype = dtypes[mode]
-
-        shape = mrc.data.shape
-        ensure(shape[1] == shape[2], "Only square images are supported")
-        L = shape[1]
         logger.debug(f"Image size = {L}x{L}")
 
         # Save original image resolution that we expect to use when we start reading actual data
         self._original_resolution = L
+        # Resolution of images returned by _images, which may be downsampled as they are read
+        self._load_resolution = L
 
-        filter_params, filter_indices = np.unique(
-            metadata[
-                [
-                    "_rlnVoltage",
-                    "_rlnDefocusU",
-                    "_rlnDefocusV",
-                    "_rlnDefocusAngle",
-                    "_rlnSphericalAberration",
-                    "_rlnAmplitudeContrast",
-                ]
-            ].values,
-            return_inverse=True,
-            axis=0,
+        # With per-particle defocus there is close to one CTF per image, so they are kept and evaluated as a batch
+        voltage, defocus_u, defocus_v, defocus_ang, Cs, alpha = (
+            np.asarray(filter_params, dtype=np.float64).reshape(-1, 6).T
+        )
+        filters = BatchCTFFilter(
+            pixel_size=self.pixel_size,
+            voltage=voltage,
+            defocus_u=defocus_u,
+            defocus_v=defocus_v,
+            defocus_ang=defocus_ang * np.pi / 180,  # degrees to radians
+            Cs=Cs,
+            alpha=alpha,
+            B=B,
         )
-
-        filters = []
-        for row in filter_params:
-            filters.append(
-                CTFFilter(
-                    pixel_size=self.pixel_size,
-                    voltage=row[0],
-                    defocus_u=row[1],
-                    defocus_v=row[2],
-                    defocus_ang=row[3] * np.pi / 180,  # degrees to radians
-                    Cs=row[4],
-                    alpha=row[5],
-                    B=B,
-                )
-            )
 
         ImageSource.__init__(
             self, L=L, n=n, dtype=dtype, metadata=metadata, memory=memory
@@ -143,6 +290,22 @@ class RelionSource(ImageSource):
     def __str__(self):
         return f"RelionSource ({self.n} images of size {self.L}x{self.L})"
 
+    def _downsample_images(self, L):
+        """
+        Downsample images to resolution L while they are read, if nothing else has been done to them yet,
+        so that full resolution images are only ever held a few at a time by the loader threads.
+        Otherwise, downsample them in the generation pipeline.
+        """
+        if (
+            self.generation_pipeline.xforms
+            or self._cached_im is not None
+            or self._load_resolution != self._original_resolution
+        ):
+            super()._downsample_images(L)
+        else:
+            logger.info(f"Downsampling images to {L}x{L} as they are loaded")
+            self._load_resolution = L
+
     def _images(self, start=0, num=np.inf, indices=None):
         if indices is None:
             indices = np.arange(start, min(start + num, self.n))
@@ -150,19 +313,37 @@ class RelionSource(ImageSource):
             start = indices.min()
         logger.info(f"Loading {len(indices)} images from STAR file")
 
+        load_resolution = self._load_resolution
+        chunk_size = config.starfile.load_chunk_size
+
         def load_single_mrcs(filepath, df):
-            arr = mrcfile.open(filepath).data
-            data = arr[df["__mrc_index"] - 1, :, :]
+            mrc_indices = df["__mrc_index"].values - 1
+            if load_resolution == self._original_resolution:
+                data = self._mrc_pool.read(filepath, mrc_indices)
+            else:
+                data = np.empty(
+                    (len(mrc_indices), load_resolution, load_resolution),
+                    dtype=self.dtype,
+                )
+                for i in range(0, len(mrc_indices), chunk_size):
+                    chunk = self._mrc_pool.read(
+                        filepath, mrc_indices[i : i + chunk_size]
+                    )
+                    data[i : i + chunk_size] = (
+                        Image(chunk.astype(self.dtype, copy=False))
+                        .downsample(load_resolution)
+                        .asnumpy()
+                    )
 
             return df.index, data
 
         n_workers = self.n_workers
         if n_workers < 0:
-            n_workers = cpu_count() - 1
+            n_workers = max(1, cpu_count() - 1)
 
         df = self._metadata.loc[indices]
         im = np.empty(
-            (len(indices), self._original_resolution, self._original_resolution),
+            (len(indices), load_resolution, load_resolution),
             dtype=self.dtype,
         )
 
@@ -1,3 +1,3 @@
 from .micrograph import Micrograph
-from .mrc import MrcStats
+from .mrc import MrcFilePool, MrcStats
 from .starfile import StarFile, StarFileBlock
@@ -5,7 +5,6 @@ import numpy as np
 from PIL import Image as PILImage
 from scipy import signal
 
-from aspire import config
 from aspire.image import Image
 from aspire.numeric import xp
 from aspire.utils import ensure
@@ -24,7 +23,20 @@ class Micrograph:
         gauss_filter_sigma=None,
         permissive=False,
         dtype=np.float32,
+        lazy=False,
     ):
+        """
+        :param filepath: Path to a .mrc (single micrograph) or .mrcs (stack of micrographs) file.
+        :param margin: None, a number of pixels to discard on every side, or a top/right/bottom/left tuple.
+        :param shrink_factor: None, or the factor by which to bin the micrograph after cropping.
+        :param square: Whether to crop the micrograph to a square after discarding margins.
+        :param gauss_filter_size: None, or the size of a Gaussian low-pass filter applied after binning.
+        :param gauss_filter_sigma: The standard deviation of that Gaussian filter.
+        :param permissive: Whether to open the file in permissive mode.
+        :param dtype: Data type the micrograph is cast to.
+        :param lazy: If True, the file is not read up front: `im` stays None, and the processed micrograph
+            is only available tile by tile through `tiles`, which keeps memory use bounded by the tile size.
+        """
         self.filepath = filepath
         self.shrink_factor = shrink_factor
         self.square = square
@@ -38,7 +50,10 @@ class Micrograph:
         self.im = None
 
         self._init_margins(margin)
-        self._read()
+        if lazy:
+            self._init_lazy()
+        else:
+            self._read()
 
     def _init_margins(self, margin):
         if margin is None:
@@ -58,6 +73,114 @@ class Micrograph:
             left,
         )
 
+    def _crop_bounds(self, height, width):
+        """
+        Rows and columns of the file kept after discarding margins and squaring.
+
+        :return: A (top, bottom, left, right) tuple of bounds, with the bottom and right excluded.
+        """
+        top = self.margin_top or 0
+        bottom = height - self.margin_bottom if self.margin_bottom else height
+        left = self.margin_left or 0
+        right = width - self.margin_right if self.margin_right else width
+        if self.square:
+            side_length = min(bottom - top, right - left)
+            bottom, right = top + side_length, left + side_length
+        return top, bottom, left, right
+
+    def _binned_shape(self, height, width):
+        if self.shrink_factor is None:
+            return height, width
+        return int(height / self.shrink_factor), int(width / self.shrink_factor)
+
+    def _init_lazy(self):
+        with mrcfile.mmap(self.filepath, mode="r", permissive=self.permissive) as mrc:
+            shape = mrc.data.shape
+        n_frames = shape[0] if len(shape) == 3 else 1
+        top, bottom, left, right = self._crop_bounds(*shape[-2:])
+        self.shape = (n_frames,) + self._binned_shape(bottom - top, right - left)
+
+    def tiles(self, tile_size=1024, overlap=0):
+        """
+        Iterate over the processed micrograph in tiles, reading only the part of the file each tile needs.
+
+        The file is memory-mapped, and each tile is cropped, binned and filtered from a region of the file
+        padded with enough extra pixels (a halo) for the resampling and Gaussian kernels. Tiles are therefore
+        identical to the corresponding regions of the micrograph processed as a whole, up to rounding.
+
+        :param tile_size: Side length of tiles, in pixels of the processed micrograph.
+        :param overlap: Number of pixels by which each tile extends into its neighbors on every side.
+        :return: A generator of (y, x, tile) tuples, where (y, x) is the position of the top left corner of the
+            tile in the processed micrograph, and tile is an ndarray of shape (n_frames, height, width).
+        """
+        ensure(tile_size > 0, "Tile size must be positive.")
+        ensure(overlap >= 0, "Tile overlap must be non-negative.")
+
+        gauss = None
+        halo = 0
+        if self.gauss_filter_size is not None:
+            gauss = Micrograph.gaussian_filter(
+                self.gauss_filter_size, self.gauss_filter_sigma
+            )
+            halo = gauss.shape[0] // 2
+
+        with mrcfile.mmap(self.filepath, mode="r", permissive=self.permissive) as mrc:
+            data = mrc.data
+            if data.ndim == 2:
+                data = data[np.newaxis]
+            top, bottom, left, right = self._crop_bounds(*data.shape[-2:])
+            height, width = bottom - top, right - left
+            out_height, out_width = self._binned_shape(height, width)
+
+            # Pixel size, in the file, of a binned pixel, and the extent of the bicubic kernel around it
+            scale_y, scale_x = height / out_height, width / out_width
+            support_y, support_x = (int(np.ceil(2 * s)) + 1 for s in (scale_y, scale_x))
+
+            for y in range(0, out_height, tile_size):
+                for x in range(0, out_width, tile_size):
+                    # The tile that is returned
+                    ty0, ty1 = max(y - overlap, 0), min(
+                        y + tile_size + overlap, out_height
+                    )
+                    tx0, tx1 = max(x - overlap, 0), min(
+                        x + tile_size + overlap, out_width
+                    )
+                    # The binned region the Gaussian filter needs to produce it
+                    by0, by1 = max(ty0 - halo, 0), min(ty1 + halo, out_height)
+                    bx0, bx1 = max(tx0 - halo, 0), min(tx1 + halo, out_width)
+                    # The region of the file the resampling needs to produce that
+                    if self.shrink_factor is None:
+                        sy0, sy1, sx0, sx1 = by0, by1, bx0, bx1
+                    else:
+                        sy0 = max(int(by0 * scale_y) - support_y, 0)
+                        sy1 = min(int(np.ceil(by1 * scale_y)) + support_y, height)
+                        sx0 = max(int(bx0 * scale_x) - support_x, 0)
+                        sx1 = min(int(np.ceil(bx1 * scale_x)) + support_x, width)
+
+                    region = data[
+                        :, top + sy0 : top + sy1, left + sx0 : left + sx1
+                    ].astype(self.dtype)
+
+                    tile = []
+                    for frame in region:
+                        if self.shrink_factor is not None:
+                            box = (
+                                bx0 * scale_x - sx0,
+                                by0 * scale_y - sy0,
+                                bx1 * scale_x - sx0,
+                                by1 * scale_y - sy0,
+                            )
+                            frame = np.array(
+                                PILImage.fromarray(frame).resize(
+                                    (bx1 - bx0, by1 - by0), PILImage.BICUBIC, box=box
+                                )
+                            )
+                        if gauss is not None:
+                            frame = signal.correlate(frame, gauss, "same")
+                        tile.append(frame[ty0 - by0 : ty1 - by0, tx0 - bx0 : tx1 - bx0])
+
+                    yield ty0, tx0, np.stack(tile)
+
     def _read(self):
         with mrcfile.open(self.filepath, permissive=self.permissive) as mrc:
             im = mrc.data
@@ -72,24 +195,12 @@ class Micrograph:
         # (shape n_images, height, width)
 
         # Discard outer pixels
-        im = im[
-            ...,
-            self.margin_top : -self.margin_bottom
-            if self.margin_bottom is not None
-            else None,
-            self.margin_left : -self.margin_right
-            if self.margin_right is not None
-            else None,
-        ]
-
-        if self.square:
-            side_length = min(im.shape[-2], im.shape[-1])
-            im = im[..., :side_length, :side_length]
+        top, bottom, left, right = self._crop_bounds(*im.shape[-2:])
+        im = im[..., top:bottom, left:right]
 
         if self.shrink_factor is not None:
-            size = tuple(
-                (np.array(im.shape) / config.apple.mrc_shrink_factor).astype(int)
-            )
+            # PIL sizes are (width, height)
+            size = self._binned_shape(*im.shape[-2:])[::-1]
             im = np.array(PILImage.fromarray(im).resize(size, PILImage.BICUBIC))
 
         if self.gauss_filter_size is not None:
@@ -1,5 +1,12 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import mrcfile
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 
 class MrcStats:
     def __init__(self):
@@ -25,8 +32,9 @@ class MrcStats:
         self.amin = min(self.amin, np.min(array_slice))
         self.amax = max(self.amax, np.max(array_slice))
         # For mean we'll do div when called.
-        self.asum += np.sum(array_slice)
-        self.asum2 += np.sum(np.square(array_slice))
+        # Sums are accumulated in double precision, whatever the precision of the data.
+        self.asum += np.sum(array_slice, dtype=np.float64)
+        self.asum2 += np.sum(np.square(array_slice, dtype=np.float64))
         self.asize += np.size(array_slice)
 
     @property
@@ -59,3 +67,98 @@ class MrcStats:
         mrcobj.header.dmax = self.amax.astype(np.float32)
         mrcobj.header.dmean = self.amean.astype(np.float32)
         mrcobj.header.rms = self.arms.astype(np.float32)
+
+
+class MrcFilePool:
+    def __init__(self, max_open=128, permissive=False):
+        """
+        A bounded pool of read-only, memory-mapped MRC file handles.
+
+        Handles are opened on first use and kept open so repeated reads
+        from the same file do not re-open and re-parse its header.
+        When more than `max_open` files are open, the least recently
+        used handles that are not currently being read are closed.
+
+        The pool is safe to share between reader threads.
+
+        :param max_open: Maximum number of files to keep open.
+        :param permissive: Passed through to `mrcfile.mmap`.
+        :return: MrcFilePool instance
+        """
+
+        self.max_open = max(1, int(max_open))
+        self.permissive = permissive
+
+        # filepath => mrcfile handle, ordered from least to most recently used.
+        self._handles = OrderedDict()
+        # filepath => number of reads currently in flight.
+        self._in_use = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __contains__(self, filepath):
+        return filepath in self._handles
+
+    def _acquire(self, filepath):
+        with self._lock:
+            mrc = self._handles.get(filepath)
+            if mrc is None:
+                logger.debug(f"MrcFilePool opening {filepath}")
+                mrc = mrcfile.mmap(filepath, mode="r", permissive=self.permissive)
+                self._handles[filepath] = mrc
+            else:
+                self._handles.move_to_end(filepath)
+            self._in_use[filepath] = self._in_use.get(filepath, 0) + 1
+            self._evict()
+        return mrc
+
+    def _release(self, filepath):
+        with self._lock:
+            self._in_use[filepath] -= 1
+            if self._in_use[filepath] == 0:
+                del self._in_use[filepath]
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock.
+        # Handles being read from are skipped, so the pool may temporarily
+        #   hold more than `max_open` files while many readers are active.
+        for filepath in list(self._handles):
+            if len(self._handles) <= self.max_open:
+                break
+            if filepath not in self._in_use:
+                logger.debug(f"MrcFilePool closing {filepath}")
+                self._handles.pop(filepath).close()
+
+    def read(self, filepath, indices):
+        """
+        Read images from a (possibly single image) MRC stack.
+
+        Only the pages backing the requested images are touched.
+
+        :param filepath: Path to MRC file.
+        :param indices: 0-based indices of the images to read.
+        :return: An ndarray of shape (len(indices), ny, nx), a copy of the file data.
+        """
+
+        mrc = self._acquire(filepath)
+        try:
+            data = mrc.data
+            if data.ndim == 2:
+                data = data[np.newaxis, :, :]
+            # Fancy indexing copies out of the mmap before the handle is released.
+            return data[indices, :, :]
+        finally:
+            self._release(filepath)
+
+    def close(self):
+        """
+        Close all handles held by this pool.
+        """
+
+        with self._lock:
+            for mrc in self._handles.values():
+                mrc.close()
+            self._handles.clear()
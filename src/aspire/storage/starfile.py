@@ -1,10 +1,18 @@
+import csv
+import io
 import logging
+import re
 from collections import OrderedDict
 
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# A loop body ends at the first blank line, or at the next data block, loop or field line.
+_LOOP_END = re.compile(r"\n[ \t\r]*(?:\n|data_|loop_|_|$)")
+# Full line comments
+_COMMENT_LINE = re.compile(r"^[ \t]*#[^\n]*(?:\n|$)", re.M)
+
 
 class StarFileBlock:
     def __init__(self, loops, name="", properties=None):
@@ -37,97 +45,165 @@ class StarFileBlock:
 
 
 class StarFile:
-    def __init__(self, starfile_path=None, blocks=None):
+    def __init__(self, starfile_path=None, blocks=None, column_types=None):
+        """
+        A StarFile object, made up of one or more `StarFileBlock`s.
+
+        :param starfile_path: Path to a star file to read.
+        :param blocks: An iterable of `StarFileBlock` objects, used if `starfile_path` is None.
+        :param column_types: An optional dictionary mapping loop field names to types (e.g. float, int, str).
+            Loop columns found in this dictionary are parsed directly to that type; all other values are read as
+            strings.
+        """
 
         self.blocks = OrderedDict()
 
         if starfile_path is not None:
-            self.init_from_starfile(starfile_path)
+            self.init_from_starfile(starfile_path, column_types=column_types)
         elif blocks is not None:
             self.init_from_blocks(blocks)
         else:
             raise RuntimeError("Invalid constructor.")
 
-    def init_from_starfile(self, starfile_path):
+    @staticmethod
+    def _parse_loop(body, field_names, column_types=None):
+        """
+        Parse the data rows of a loop into a DataFrame.
+
+        The whole loop body is handed to the C tokenizer of `pandas.read_csv` in one go.
+        If that fails (ragged rows with extra values, or values that cannot be cast to the
+        requested types), we fall back to tokenizing the rows one at a time.
+
+        :param body: A string holding the data rows of a single loop.
+        :param field_names: A list of field names of the loop.
+        :param column_types: An optional dictionary mapping field names to types.
+        :return: A DataFrame with one column per field.
+        """
+        dtypes = {name: str for name in field_names}
+        if column_types is not None:
+            dtypes.update(
+                {k: v for k, v in column_types.items() if k in dtypes and v is not str}
+            )
+
+        # Comment lines may be interspersed with data rows
+        if "#" in body:
+            body = _COMMENT_LINE.sub("", body)
+
+        try:
+            return pd.read_csv(
+                io.StringIO(body),
+                sep=r"\s+",
+                header=None,
+                names=field_names,
+                index_col=False,
+                dtype=dtypes,
+                na_filter=False,
+                quoting=csv.QUOTE_NONE,
+                engine="c",
+            )
+        except (pd.errors.ParserError, ValueError, TypeError) as e:
+            logger.debug(f"Bulk loop parse failed ({e}), parsing row by row.")
+
+        rows = []
+        for i, line in enumerate(body.splitlines()):
+            tokens = line.split()
+            if not tokens:
+                continue
+            if len(tokens) < len(field_names):
+                logger.warning(
+                    f"Loop row {i} - Expected {len(field_names)} values, got {len(tokens)}."
+                )
+                tokens.extend([""] * (len(field_names) - len(tokens)))
+            else:
+                tokens = tokens[: len(field_names)]  # ignore any extra tokens
+
+            rows.append(tokens)
+
+        df = pd.DataFrame(rows, columns=field_names, dtype=str)
+        if column_types is not None:
+            try:
+                df = df.astype({k: v for k, v in dtypes.items() if v is not str})
+            except (ValueError, TypeError) as e:
+                # Leave the values as strings; the caller sees the same error on casting.
+                logger.debug(f"Could not apply column types to loop: {e}")
+        return df
+
+    def init_from_starfile(self, starfile_path, column_types=None):
         """
         Initalize a StarFile from a star file at a given path
         :param starfile_path: Path to saved starfile.
+        :param column_types: An optional dictionary mapping loop field names to types.
         :return: An initialized StarFile object
         """
         logger.info(f"Parsing starfile at path {starfile_path}")
         with open(starfile_path, "r") as f:
-
-            blocks = []  # list of StarFileBlock objects
-            block_name = ""  # name of current block
-            properties = {}  # key value mappings to add to current block
-
-            loops = []  # a list of DataFrames
-            in_loop = False  # whether we're inside a loop
-            field_names = []  # current field names inside a loop
-            rows = []  # rows to add to current loop
-
-            for i, line in enumerate(f):
-                line = line.strip()
-
-                if line.startswith("#"):
-                    continue
-
-                # When in a 'loop', any blank line implies we break out of the loop
-                if not line:
-                    if in_loop:
-                        if rows:  # We have accumulated data for a loop
-                            loops.append(
-                                pd.DataFrame(rows, columns=field_names, dtype=str)
-                            )
-                            field_names = []
-                            rows = []
-                            in_loop = False
-
-                elif line.startswith("data_"):
-                    if loops or properties:
-                        blocks.append(
-                            StarFileBlock(loops, name=block_name, properties=properties)
-                        )
-                        loops = []
-                        properties = {}
-                    block_name = line[
-                        5:
-                    ]  # note: block name might be, and most likely would be blank
-
-                elif line.startswith("loop_"):
-                    in_loop = True
-
-                elif line.startswith("_"):  # We have a field
-                    if in_loop:
-                        field_names.append(line.split()[0])
-                    else:
-                        k, v = line.split()[:2]
-                        properties[k] = v
-
+            text = f.read()
+
+        blocks = []  # list of StarFileBlock objects
+        block_name = ""  # name of current block
+        properties = {}  # key value mappings to add to current block
+
+        loops = []  # a list of DataFrames
+        in_loop = False  # whether we're inside a loop
+        field_names = []  # current field names inside a loop
+
+        # Header lines are few and are walked one at a time.
+        # Loop bodies are located with a regex and parsed in bulk.
+        pos = 0
+        while pos < len(text):
+            line_start = pos
+            line_end = text.find("\n", pos)
+            if line_end == -1:
+                line_end = len(text)
+            pos = line_end + 1
+            line = text[line_start:line_end].strip()
+
+            if not line or line.startswith("#"):
+                continue
+
+            elif line.startswith("data_"):
+                if loops or properties:
+                    blocks.append(
+                        StarFileBlock(loops, name=block_name, properties=properties)
+                    )
+                    loops = []
+                    properties = {}
+                block_name = line[
+                    5:
+                ]  # note: block name might be, and most likely would be blank
+                in_loop = False
+                field_names = []
+
+            elif line.startswith("loop_"):
+                in_loop = True
+                field_names = []
+
+            elif line.startswith("_"):  # We have a field
+                if in_loop:
+                    field_names.append(line.split()[0])
                 else:
-                    # we're looking at a data row
-                    tokens = line.split()
-                    if len(tokens) < len(field_names):
-                        logger.warning(
-                            f"Line {i} - Expected {len(field_names)} values, got {len(tokens)}."
-                        )
-                        tokens.extend([""] * (len(field_names) - len(tokens)))
-                    else:
-                        tokens = tokens[: len(field_names)]  # ignore any extra tokens
-
-                    rows.append(tokens)
-
-            # Any pending rows to be added?
-            if rows:
-                loops.append(pd.DataFrame(rows, columns=field_names, dtype=str))
-
-            # Any pending loops/properties to be added?
-            if loops or properties:
-                blocks.append(
-                    StarFileBlock(loops, name=block_name, properties=properties)
+                    k, v = line.split()[:2]
+                    properties[k] = v
+
+            elif in_loop:
+                # We're looking at the first data row of a loop.
+                # The loop body runs up to the next blank line or header line.
+                match = _LOOP_END.search(text, line_start)
+                body_end = match.start() + 1 if match else len(text)
+                loops.append(
+                    self._parse_loop(
+                        text[line_start:body_end], field_names, column_types
+                    )
                 )
+                pos = body_end
+                in_loop = False
+                field_names = []
 
-            logger.info("StarFile parse complete")
+        # Any pending loops/properties to be added?
+        if loops or properties:
+            blocks.append(StarFileBlock(loops, name=block_name, properties=properties))
+
+        logger.info("StarFile parse complete")
 
         logger.info("Initializing StarFile object from data")
         self.init_from_blocks(blocks)
@@ -157,7 +233,35 @@ class StarFile:
     def __eq__(self, other):
         return all(b1 == b2 for b1, b2 in zip(self.blocks, other.blocks))
 
-    def save(self, f):
+    @staticmethod
+    def _format_column(values, float_precision=None):
+        """
+        Format a column of loop values as a list of strings.
+
+        :param values: An ndarray of column values.
+        :param float_precision: Number of digits after the decimal point for floating point values.
+            If None, the shortest representation that round-trips is used.
+        :return: A list of strings.
+        """
+        if values.dtype.kind == "f" and float_precision is not None:
+            return list(map(f"{{:.{float_precision}f}}".format, values.tolist()))
+        elif values.dtype.kind in "biuf":
+            # numpy formats the whole column in C
+            return values.astype(str).tolist()
+        else:
+            return list(map(str, values))
+
+    def save(self, f, float_precision=None, chunksize=100000):
+        """
+        Write this StarFile to a file handle.
+
+        Loops are formatted a column at a time and streamed out in chunks of rows.
+
+        :param f: A file handle open for writing.
+        :param float_precision: Optional number of digits after the decimal point used for floating point
+            loop values. If None (default), the shortest representation that round-trips is used.
+        :param chunksize: Number of loop rows formatted and written at a time.
+        """
         for block in self:
             f.write(f"data_{block.name}\n\n")
             if block.properties is not None:
@@ -168,6 +272,12 @@ class StarFile:
                 f.write("loop_\n")
                 for col in loop.columns:
                     f.write(f"{col}\n")
-                for _, row in loop.iterrows():
-                    f.write(" ".join(map(str, row)) + "\n")
+                for start in range(0, len(loop), chunksize):
+                    chunk = loop.iloc[start : start + chunksize]
+                    columns = [
+                        self._format_column(chunk.iloc[:, j].values, float_precision)
+                        for j in range(chunk.shape[1])
+                    ]
+                    f.write("\n".join(map(" ".join, zip(*columns))))
+                    f.write("\n")
                 f.write("\n")
@@ -1,4 +1,11 @@
-from .misc import abs2, ensure, get_full_version, powerset, sha256sum  # isort:skip
+from .misc import (  # isort:skip
+    abs2,
+    ensure,
+    get_full_version,
+    group_indices,
+    powerset,
+    sha256sum,
+)
 from .matrix import (
     acorr,
     ainner,
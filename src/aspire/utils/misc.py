@@ -7,6 +7,8 @@ import os.path
 import subprocess
 from itertools import chain, combinations
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -93,6 +95,29 @@ def powerset(iterable):
     return chain.from_iterable(combinations(s, r) for r in range(len(s) + 1))
 
 
+def group_indices(labels):
+    """
+    Group the positions of equal values in an array of labels. Example:
+
+    group_indices([2,0,2,1]) --> [(0, [1]), (1, [3]), (2, [0,2])]
+
+    The cost depends only on the length of `labels`, not on the range of values it may hold.
+
+    :param labels: A 1-D array of integer labels.
+    :return: A list of (label, positions) tuples, one per distinct label in increasing order,
+        where positions is an ndarray of the indices at which that label occurs, in increasing order.
+    """
+
+    labels = np.asarray(labels).ravel()
+    if labels.size == 0:
+        return []
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    boundaries = np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    return list(zip(sorted_labels[starts], np.split(order, boundaries)))
+
+
 def sha256sum(filename):
     """
     Return sha256 hash of filename.
@@ -2,6 +2,8 @@
 Utilities for controlling and generating random numbers.
 """
 
+import threading
+
 import numpy as np
 from scipy.special import erfinv
 
@@ -9,6 +11,8 @@ from aspire.utils.matlab_compat import m_reshape
 
 # A list of random states, used as a stack
 random_states = []
+# Seeded sections swap numpy's global random state, so only one thread may be inside one at a time
+_random_lock = threading.RLock()
 
 
 def choice(*args, **kwargs):
@@ -87,6 +91,7 @@ class Random:
 
     def __enter__(self):
         if self.seed is not None:
+            _random_lock.acquire()
             # Push current state on stack
             random_states.append(np.random.get_state())
 
@@ -101,3 +106,4 @@ class Random:
     def __exit__(self, *args):
         if self.seed is not None:
             np.random.set_state(random_states.pop())
+            _random_lock.release()
@@ -163,7 +163,7 @@ class Volume:
         # TODO: rotated_grids might as well give us correctly shaped array in the first place
         pts_rot = m_reshape(pts_rot, (3, self.resolution ** 2 * n))
 
-        im_f = nufft(data, pts_rot) / self.resolution
+        im_f = nufft(data, pts_rot, site="projection") / self.resolution
 
         im_f = im_f.reshape(-1, self.resolution, self.resolution)
 
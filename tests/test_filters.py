@@ -4,14 +4,18 @@ from unittest import TestCase
 import numpy as np
 
 from aspire.operators import (
+    BatchCTFFilter,
     CTFFilter,
+    FilterGridCache,
     FunctionFilter,
     IdentityFilter,
+    LambdaFilter,
     PowerFilter,
     RadialCTFFilter,
     ScalarFilter,
     ScaledFilter,
     ZeroFilter,
+    grid_cache,
 )
 from aspire.utils import utest_tolerance
 
@@ -109,6 +113,75 @@ class SimTestCase(TestCase):
         result2 = filt.evaluate(self.omega * scale_value)
         self.assertTrue(np.allclose(result1, result2, atol=utest_tolerance(self.dtype)))
 
+    def testBatchCTFFilter(self):
+        params = dict(
+            voltage=np.array([200, 300, 300]),
+            defocus_u=np.array([1.5e4, 2e4, 2.5e4]),
+            defocus_v=np.array([1.5e4, 1.8e4, 2.2e4]),
+            defocus_ang=np.array([0, 0.3, 1.2]),
+            Cs=2.0,
+            alpha=0.1,
+        )
+        batch = BatchCTFFilter(pixel_size=2, B=10, **params)
+        filters = [
+            CTFFilter(
+                pixel_size=2,
+                B=10,
+                **{k: np.broadcast_to(v, 3)[i] for k, v in params.items()},
+            )
+            for i in range(3)
+        ]
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch[1].defocus_u, 2e4)
+
+        omega = self.omega.astype(np.float64)
+        result = batch.evaluate(omega)
+        self.assertEqual(result.shape, (3, 256))
+        for i, filt in enumerate(filters):
+            self.assertTrue(np.allclose(result[i], filt.evaluate(omega)))
+
+        # Grids, sub-batches, scaling and phase flipping match the individual filters
+        sub_batch = LambdaFilter(batch[[2, 0]].scale(1.5), np.sign)
+        result = sub_batch.evaluate_grid(9, dtype=np.float64)
+        self.assertEqual(result.shape, (2, 9, 9))
+        for i, filt in zip((2, 0), result):
+            expected = LambdaFilter(filters[i].scale(1.5), np.sign).evaluate_grid(
+                9, dtype=np.float64
+            )
+            self.assertTrue(np.allclose(filt, expected))
+
+    def testGridCache(self):
+        filt = RadialCTFFilter(defocus=2.5e4)
+        grid = filt.evaluate_grid(8, dtype=self.dtype)
+        # Repeated evaluations share one read-only grid
+        self.assertIs(filt.evaluate_grid(8, dtype=self.dtype), grid)
+        self.assertFalse(grid.flags.writeable)
+        self.assertIsNot(filt.evaluate_grid(8, dtype=np.float64), grid)
+        self.assertIsNot(filt.evaluate_grid(10, dtype=self.dtype), grid)
+
+        # Scaled copies are distinct filters
+        scaled = filt.scale(2)
+        self.assertFalse(np.allclose(scaled.evaluate_grid(8, dtype=self.dtype), grid))
+
+        # Invalidated grids are evaluated again, to the same values
+        grid_cache.invalidate(filt)
+        regrid = filt.evaluate_grid(8, dtype=self.dtype)
+        self.assertIsNot(regrid, grid)
+        self.assertTrue(np.array_equal(regrid, grid))
+
+    def testFilterGridCacheBudget(self):
+        cache = FilterGridCache(max_bytes=2 * 8 * 8 * 4)
+        grids = [np.full((8, 8), i, dtype=np.float32) for i in range(3)]
+        for i, grid in enumerate(grids):
+            cache.put(("f", i), grid)
+        # The least recently used grid is evicted
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(("f", 0)))
+        self.assertIs(cache.get(("f", 2)), grids[2])
+        # Grids larger than the budget aren't kept
+        self.assertTrue(cache.put(("f", 3), np.zeros((16, 16))).flags.writeable)
+        self.assertEqual(cache.nbytes, 2 * 8 * 8 * 4)
+
     def testRadialCTFFilter(self):
         filter = RadialCTFFilter(defocus=2.5e4)
         result = filter.evaluate(self.omega)
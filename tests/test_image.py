@@ -2,6 +2,7 @@ import os.path
 from unittest import TestCase
 
 import numpy as np
+from parameterized import parameterized
 from scipy import misc
 
 from aspire.image import Image, _im_translate2
@@ -47,6 +48,21 @@ class ImageTestCase(TestCase):
         self.assertTrue(np.allclose(im1.asnumpy(), im2.asnumpy()))
         self.assertTrue(np.allclose(im1.asnumpy()[0, :, :], im3))
 
+    def testImShiftStack(self):
+        # One integer shift per image amounts to rolling each image, in the precision of the images
+        shifts = np.array([[10, -20], [0, 5], [-300, 7]])
+        ims = Image(self.ims_np.astype(np.float32))
+        im = ims.shift(shifts)
+        self.assertEqual(im.dtype, np.float32)
+        for i in range(self.n):
+            self.assertTrue(
+                np.allclose(
+                    im.asnumpy()[i],
+                    np.roll(self.ims_np[i], -shifts[i], axis=(0, 1)),
+                    atol=1e-2,
+                )
+            )
+
     def testArrayImageSource(self):
         # An Image can be wrapped in an ArrayImageSource when we need to deal with ImageSource objects.
         src = ArrayImageSource(self.im)
@@ -76,3 +92,26 @@ class ImageTestCase(TestCase):
                     self.ims.flip_axes()[i], self.im_np[0].T * (i + 1) / float(self.n)
                 )
             )
+
+    @parameterized.expand([(32, 16), (32, 15), (33, 16), (33, 13), (32, 32)])
+    def testImageDownsample(self, L, ds_res):
+        def band_limited(n, phases):
+            # Periodic over L input pixels, with frequencies below the Nyquist frequency of ds_res
+            x = (np.arange(n) - n // 2) * L / n
+            x, y = np.meshgrid(x, x, indexing="ij")
+            k = (ds_res - 1) // 2
+            return np.stack(
+                [
+                    1
+                    + np.cos(2 * np.pi * (k * x - 2 * y) / L + p)
+                    + 0.5 * np.sin(2 * np.pi * (x + k * y) / L - p)
+                    for p in phases
+                ]
+            )
+
+        phases = np.linspace(0, np.pi, 4)
+        im = Image(band_limited(L, phases))
+        im_ds = im.downsample(ds_res)
+        self.assertEqual(im_ds.shape, (4, ds_res, ds_res))
+        # Band-limited images are resampled exactly
+        self.assertTrue(np.allclose(im_ds.asnumpy(), band_limited(ds_res, phases)))
@@ -1,6 +1,10 @@
+import os
+import tempfile
 from unittest import TestCase
 
 import importlib_resources
+import mrcfile
+import numpy as np
 
 import tests.saved_test_data
 from aspire.storage import Micrograph
@@ -8,10 +12,25 @@ from aspire.storage import Micrograph
 
 class MicrographTestCase(TestCase):
     def setUp(self):
-        pass
+        self.tmpdir = tempfile.TemporaryDirectory()
 
     def tearDown(self):
-        pass
+        self.tmpdir.cleanup()
+
+    def _write_mrc(self, data):
+        path = os.path.join(self.tmpdir.name, "micrograph.mrc")
+        with mrcfile.new(path) as mrc:
+            mrc.set_data(data.astype(np.float32))
+        return path
+
+    def _stitch(self, micrograph, tile_size, overlap):
+        im = np.full(micrograph.shape, np.nan)
+        for y, x, tile in micrograph.tiles(tile_size, overlap=overlap):
+            self.assertTrue(
+                np.all(tile.shape[-2:] <= np.array(tile_size + 2 * overlap))
+            )
+            im[:, y : y + tile.shape[1], x : x + tile.shape[2]] = tile
+        return im
 
     def testShape1(self):
         # Load a single micrograph and check its shape
@@ -28,3 +47,31 @@ class MicrographTestCase(TestCase):
 
         # The first 2 dimensions are the shape of each image, the last dimension the number of images
         self.assertEqual(micrograph.im.shape, (17, 200, 200))
+
+    def testTiles(self):
+        np.random.seed(0)
+        path = self._write_mrc(np.random.rand(130, 150))
+        kwargs = dict(
+            margin=(3, 4, 5, 6),
+            square=True,
+            shrink_factor=2,
+            gauss_filter_size=15,
+            gauss_filter_sigma=0.5,
+        )
+        micrograph = Micrograph(path, **kwargs)
+        lazy = Micrograph(path, lazy=True, **kwargs)
+        self.assertIsNone(lazy.im)
+        self.assertEqual(lazy.shape, micrograph.im.shape)
+        self.assertEqual(lazy.shape, (1, 61, 61))
+
+        for tile_size, overlap in [(16, 0), (23, 5), (128, 0)]:
+            im = self._stitch(lazy, tile_size, overlap)
+            self.assertTrue(np.allclose(im, micrograph.im.asnumpy(), atol=1e-5))
+
+    def testTilesStack(self):
+        np.random.seed(0)
+        data = np.random.rand(3, 40, 40)
+        path = self._write_mrc(data)
+        micrograph = Micrograph(path, margin=2, square=True, lazy=True)
+        im = self._stitch(micrograph, 10, 2)
+        self.assertTrue(np.allclose(im, data[:, 2:-2, 2:-2]))
@@ -7,7 +7,7 @@ from unittest import TestCase
 import mrcfile
 import numpy as np
 
-from aspire.storage import MrcStats
+from aspire.storage import MrcFilePool, MrcStats
 from aspire.utils.misc import sha256sum
 
 logger = logging.getLogger(__name__)
@@ -95,3 +95,43 @@ class MrcStatsTestCase(TestCase):
             logging.debug(f"sha256(file1): {sha256sum(files[1])}")
 
             self.assertTrue(comparison)
+
+
+class MrcFilePoolTestCase(TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.n = 5
+        self.files = []
+        for i in range(3):
+            filepath = os.path.join(self._tmpdir.name, f"stack_{i}.mrcs")
+            data = np.arange(self.n * 4 * 4, dtype=np.float32).reshape(self.n, 4, 4)
+            with mrcfile.new(filepath) as mrc:
+                mrc.set_data(data + 100 * i)
+            self.files.append(filepath)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def testRead(self):
+        pool = MrcFilePool(max_open=2)
+        data = pool.read(self.files[1], np.array([3, 0]))
+        self.assertEqual(data.shape, (2, 4, 4))
+        self.assertTrue(np.all(data[0] == 100 + np.arange(48, 64).reshape(4, 4)))
+        self.assertTrue(np.all(data[1] == 100 + np.arange(16).reshape(4, 4)))
+        pool.close()
+
+    def testEviction(self):
+        pool = MrcFilePool(max_open=2)
+        for filepath in self.files:
+            pool.read(filepath, [0])
+        # The least recently used file has been closed
+        self.assertEqual(len(pool), 2)
+        self.assertNotIn(self.files[0], pool)
+
+        # Touching a file keeps it open over others
+        pool.read(self.files[1], [0])
+        pool.read(self.files[0], [0])
+        self.assertIn(self.files[1], pool)
+        self.assertNotIn(self.files[2], pool)
+        pool.close()
+        self.assertEqual(len(pool), 0)
@@ -1,6 +1,7 @@
 from unittest import TestCase
 
 import importlib_resources
+import mrcfile
 import numpy as np
 
 import tests.saved_test_data
@@ -29,3 +30,20 @@ class MicrographTestCase(TestCase):
             image_stack = mrc_stack.images(start=0, num=5)
             # The shape of the resulting ImageStack is 200 (height) x 200 (width) x 5 (n_images)
             self.assertEqual(image_stack.shape, (5, 200, 200))
+
+    def testLazyImages(self):
+        with importlib_resources.path(tests.saved_test_data, "sample.mrcs") as path:
+            with mrcfile.open(path) as mrc:
+                data = mrc.data.copy()
+
+            mrc_stack = MrcStack(path)
+            image_stack = mrc_stack.images(start=3, num=4)
+            self.assertEqual(image_stack.dtype, np.float32)
+            self.assertTrue(np.allclose(image_stack.asnumpy(), data[3:7]))
+
+            # Keep the dtype of the file
+            mrc_stack = MrcStack(path, dtype=None)
+            self.assertEqual(mrc_stack.dtype, data.dtype)
+            image_stack = mrc_stack.images(start=0, num=np.inf)
+            self.assertTrue(np.array_equal(image_stack.asnumpy(), data))
+            mrc_stack.close()
@@ -4,7 +4,20 @@ from unittest.case import SkipTest
 
 import numpy as np
 
-from aspire.nufft import Plan, backend_available
+from aspire.basis import FFBBasis2D
+from aspire.config import config_override
+from aspire.image import Image
+from aspire.nufft import (
+    Plan,
+    PlanCache,
+    all_backends,
+    anufft,
+    backend_available,
+    get_plan,
+    nufft,
+    nufft_epsilon,
+    plan_cache,
+)
 from aspire.utils.types import complex_type, utest_tolerance
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "saved_test_data")
@@ -883,6 +896,95 @@ class SimTestCase(TestCase):
                 np.allclose(result[r], self.adjoint_plane, atol=utest_tolerance(dtype))
             )
 
+    def testPlanCache(self):
+        if not all_backends():
+            raise SkipTest
+
+        plan_cache.clear()
+        pts = self.fourier_pts.astype(np.float64)
+        sig_f = self.recip_space.astype(np.complex128)
+
+        # Points identified by value are cached once seen twice
+        result = anufft(sig_f, pts, self.vol.shape)
+        self.assertEqual(len(plan_cache), 0)
+        anufft(sig_f, pts, self.vol.shape)
+        self.assertEqual(len(plan_cache), 1)
+        plan = get_plan(self.vol.shape, pts.copy())
+        self.assertIs(get_plan(self.vol.shape, pts), plan)
+        self.assertEqual(plan_cache.nbytes, plan.nbytes)
+
+        # Points identified by a caller's key are cached straight away
+        keyed = anufft(sig_f, pts, self.vol.shape, key="pts")
+        self.assertEqual(len(plan_cache), 2)
+        self.assertIsNot(get_plan(self.vol.shape, pts, key="pts"), plan)
+        self.assertEqual(len(plan_cache), 2)
+        self.assertTrue(np.allclose(keyed, result))
+        self.assertTrue(
+            np.allclose(result, self.adjoint_vol, atol=utest_tolerance(np.float64))
+        )
+
+        # Plans over the budget are evicted, least recently used first
+        small = PlanCache(max_bytes=plan.nbytes)
+        small.put("a", plan)
+        small.put("b", plan)
+        self.assertEqual(len(small), 1)
+        self.assertIsNone(small.get("a"))
+        plan_cache.clear()
+
+    def testEpsilonPolicy(self):
+        self.assertEqual(nufft_epsilon(np.float32), 1e-6)
+        self.assertEqual(nufft_epsilon(np.complex128), 1e-8)
+        self.assertEqual(nufft_epsilon(np.float32, "basis"), 1e-6)
+        with config_override({"nfft.epsilon_basis": 1e-4}):
+            self.assertEqual(nufft_epsilon(np.float32, "basis"), 1e-4)
+            self.assertEqual(nufft_epsilon(np.float32, "projection"), 1e-6)
+
+    def testEpsilonPolicyBasis(self):
+        if not all_backends():
+            raise SkipTest
+
+        # Expansions at the default single precision tolerance match those at a much tighter one
+        basis = FFBBasis2D((8, 8), dtype=np.float32)
+        x = Image(self.plane.astype(np.float32))
+        v = basis.evaluate_t(x)
+        with config_override({"nfft.epsilon_basis": 1e-12}):
+            v_tight = basis.evaluate_t(x)
+            x_tight = basis.evaluate(v_tight).asnumpy()
+        self.assertTrue(
+            np.allclose(v, v_tight, atol=utest_tolerance(np.float32), rtol=0)
+        )
+        self.assertTrue(
+            np.allclose(
+                basis.evaluate(v_tight).asnumpy(),
+                x_tight,
+                atol=utest_tolerance(np.float32),
+                rtol=0,
+            )
+        )
+
+    def testChunking(self):
+        if not all_backends():
+            raise SkipTest
+
+        pts = self.fourier_pts.astype(np.float64)
+        sig_f = np.stack([self.recip_space, 2 * self.recip_space])
+        adjoint = anufft(sig_f, pts, self.vol.shape)
+        transform = nufft(self.vol, pts)
+
+        # Budget for one or two points at a time
+        with config_override({"nfft.chunk_bytes": 200}):
+            adjoint_chunked = anufft(sig_f, pts, self.vol.shape)
+            transform_chunked = nufft(self.vol, pts)
+
+        self.assertTrue(np.allclose(adjoint_chunked, adjoint))
+        self.assertTrue(
+            np.allclose(
+                adjoint_chunked[0], self.adjoint_vol, atol=utest_tolerance(np.float64)
+            )
+        )
+        self.assertEqual(transform_chunked.shape, (4,))
+        self.assertTrue(np.allclose(transform_chunked, transform))
+
     # TODO: This list could be done better, as some sort of matrix
     #    once there are no raise exceptions, but more pressing things...
 
@@ -0,0 +1,124 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from aspire.config import config_override
+from aspire.image import Image
+from aspire.image.cache import StepCache
+from aspire.image.xform import Multiply, Pipeline
+from aspire.source.simulation import Simulation
+
+
+class CountingXform(Multiply):
+    """
+    A `Multiply` Xform that counts the images passed through it.
+    """
+
+    # Always applied through `_forward`, so that every image is counted
+    fourier_diagonal = False
+
+    def __init__(self, factor):
+        super().__init__(factor)
+        self.n_seen = 0
+
+    def _forward(self, im, indices):
+        self.n_seen += im.n_images
+        return super()._forward(im, indices)
+
+
+class StepCacheTestCase(TestCase):
+    def testLRU(self):
+        cache = StepCache(max_bytes=2 * 80)
+        for k in range(3):
+            cache.put(str(k), np.full(10, k, dtype=np.float64))
+
+        # "0" was least recently used and is gone
+        self.assertIsNone(cache.get("0"))
+        self.assertEqual(cache.nbytes, 160)
+        self.assertTrue(np.all(cache.get("1") == 1))
+
+        cache.put("3", np.zeros(10))
+        # "1" was used more recently than "2"
+        self.assertIn("1", cache)
+        self.assertNotIn("2", cache)
+
+    def testCopies(self):
+        cache = StepCache(max_bytes=1024)
+        a = np.zeros(10)
+        cache.put("a", a)
+        a[0] = 1
+        b = cache.get("a")
+        b[1] = 1
+        self.assertTrue(np.all(cache.get("a") == 0))
+
+    def testSpill(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = StepCache(max_bytes=80, location=tmpdir)
+            cache.put("a", np.full(10, 1.0))
+            cache.put("b", np.full(10, 2.0))
+            self.assertEqual(len(os.listdir(cache.location)), 1)
+
+            # "a" is read back from disk
+            self.assertTrue(np.all(cache.get("a") == 1))
+            self.assertTrue(np.all(cache.get("b") == 2))
+            self.assertEqual(cache.misses, 0)
+
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+            self.assertEqual(os.listdir(cache.location), [])
+
+
+class PipelineCacheTestCase(TestCase):
+    def setUp(self):
+        self.im = Image(np.random.randn(16, 8, 8).astype(np.float32))
+        self.indices = np.arange(16)
+
+    def testDisabled(self):
+        xform = CountingXform(2)
+        pipeline = Pipeline(xforms=[xform], cache_bytes=0)
+        for _ in range(2):
+            pipeline.forward(self.im, self.indices)
+        self.assertEqual(xform.n_seen, 32)
+        self.assertIsNone(pipeline.cached(self.indices))
+
+    def testSteps(self):
+        xform1, xform2 = CountingXform(2), CountingXform(3)
+        pipeline = Pipeline(xforms=[xform1], cache_bytes=1 << 20)
+        pipeline.forward(self.im, self.indices)
+        im = pipeline.forward(self.im, self.indices)
+        self.assertEqual(xform1.n_seen, 16)
+        self.assertTrue(np.allclose(im.asnumpy(), 2 * self.im.asnumpy()))
+        self.assertTrue(
+            np.allclose(pipeline.cached(self.indices).asnumpy(), im.asnumpy())
+        )
+
+        # A new step picks up from the cached output of the first
+        pipeline.add_xform(xform2)
+        im = pipeline.forward(self.im, self.indices)
+        self.assertEqual((xform1.n_seen, xform2.n_seen), (16, 16))
+        self.assertTrue(np.allclose(im.asnumpy(), 6 * self.im.asnumpy()))
+
+        # Different indices, or a disabled step, are cached separately
+        pipeline.forward(Image(self.im[:4]), self.indices[:4])
+        self.assertEqual(xform1.n_seen, 20)
+        with xform2.disabled():
+            im = pipeline.forward(self.im, self.indices)
+        self.assertTrue(np.allclose(im.asnumpy(), 2 * self.im.asnumpy()))
+
+        pipeline.reset()
+        self.assertIsNone(pipeline.cached(self.indices))
+
+    def testSimulation(self):
+        with config_override({"pipeline.cache_bytes": 1 << 20}):
+            sim = Simulation(L=8, n=64, dtype="single")
+        sim.generation_pipeline.add_xform(Multiply(2))
+        im = sim.images(0, 32).asnumpy()
+        cached = sim.generation_pipeline.cached(np.arange(32))
+        self.assertTrue(np.allclose(cached.asnumpy(), im))
+        self.assertTrue(np.allclose(sim.images(0, 32).asnumpy(), im))
+
+        # Changing metadata invalidates cached images
+        sim.offsets = np.zeros((64, 2))
+        self.assertIsNone(sim.generation_pipeline.cached(np.arange(32)))
@@ -0,0 +1,108 @@
+from unittest import TestCase
+
+import numpy as np
+from parameterized import parameterized
+
+from aspire.image import Image
+from aspire.image.xform import (
+    Add,
+    Downsample,
+    FilterXform,
+    IndexedXform,
+    Multiply,
+    Pipeline,
+    Shift,
+)
+from aspire.operators import ArrayFilter, LambdaFilter, RadialCTFFilter
+from aspire.utils import utest_tolerance
+
+
+class PipelineFusionTestCase(TestCase):
+    def _xforms(self, L, n):
+        np.random.seed(0)
+        ctfs = [RadialCTFFilter(defocus=d) for d in np.linspace(1.5e4, 2.5e4, 3)]
+        phase_flip = IndexedXform(
+            [FilterXform(LambdaFilter(f, np.sign)) for f in ctfs],
+            np.random.randint(0, 3, n),
+        )
+        # Not symmetric in frequency, so its product is not the transform of a real image
+        whiten = FilterXform(ArrayFilter(np.random.rand(L, L) + 0.5))
+        return [
+            phase_flip,
+            Shift(np.random.randn(n, 2) * 2),
+            Multiply(-1),
+            whiten,
+            Multiply(np.random.rand(n) + 0.5),
+        ]
+
+    @parameterized.expand([(8, np.float32), (7, np.float32), (8, np.float64)])
+    def testEquivalence(self, L, dtype):
+        n = 32
+        im = Image(np.random.randn(n, L, L).astype(dtype))
+        indices = np.arange(4, 4 + n)
+
+        fused = Pipeline(self._xforms(L, 64), fuse=True)
+        unfused = Pipeline(self._xforms(L, 64), fuse=False)
+        self.assertEqual(fused._segments(), [(0, 5)])
+        self.assertEqual(len(unfused._segments()), 5)
+
+        result_fused = fused.forward(im, indices).asnumpy()
+        result_unfused = unfused.forward(im, indices).asnumpy()
+        self.assertTrue(
+            np.allclose(result_fused, result_unfused, atol=utest_tolerance(dtype))
+        )
+
+    def testSegments(self):
+        L, n = 8, 16
+        xforms = self._xforms(L, n)
+        xforms.insert(2, Add(1))
+        pipeline = Pipeline(xforms, fuse=True)
+        self.assertEqual(pipeline._segments(), [(0, 2), (2, 3), (3, 6)])
+
+        # Disabled Xforms do not break up a run
+        with xforms[2].disabled():
+            self.assertEqual(pipeline._segments(), [(0, 6)])
+            im = Image(np.random.randn(n, L, L).astype(np.float32))
+            result_fused = pipeline.forward(im).asnumpy()
+            pipeline.fuse = False
+            result_unfused = pipeline.forward(im).asnumpy()
+        self.assertTrue(np.allclose(result_fused, result_unfused, atol=1e-5))
+
+    @parameterized.expand(
+        [
+            (16, 8, np.float32),
+            (16, 7, np.float32),
+            (15, 8, np.float32),
+            (16, 8, np.float64),
+        ]
+    )
+    def testDownsample(self, L, ds_res, dtype):
+        n = 32
+        im = Image(np.random.randn(n, L, L).astype(dtype))
+        indices = np.arange(n)
+
+        def xforms():
+            np.random.seed(0)
+            ctfs = [RadialCTFFilter(defocus=d) for d in np.linspace(1.5e4, 2.5e4, 3)]
+            return [
+                IndexedXform(
+                    [FilterXform(LambdaFilter(f, np.sign)) for f in ctfs],
+                    np.random.randint(0, 3, n),
+                ),
+                Shift(np.random.randn(n, 2) * 2),
+                Downsample(ds_res),
+                # Evaluated at the new resolution
+                FilterXform(LambdaFilter(ctfs[0], lambda x: 1 / (np.abs(x) + 0.5))),
+                Multiply(np.random.rand(n) + 0.5),
+            ]
+
+        fused = Pipeline(xforms(), fuse=True)
+        unfused = Pipeline(xforms(), fuse=False)
+        self.assertEqual(fused._segments(), [(0, 5)])
+
+        result_fused = fused.forward(im, indices).asnumpy()
+        result_unfused = unfused.forward(im, indices).asnumpy()
+        self.assertEqual(result_fused.shape, (n, ds_res, ds_res))
+        self.assertTrue(
+            np.allclose(result_fused, result_unfused, atol=utest_tolerance(dtype))
+        )
@@ -3,9 +3,9 @@ from unittest import TestCase
 
 import numpy as np
 
-from aspire.noise import AnisotropicNoiseEstimator
+from aspire.noise import AnisotropicNoiseEstimator, WhiteNoiseEstimator
 from aspire.operators.filters import FunctionFilter, RadialCTFFilter, ScalarFilter
-from aspire.source import ArrayImageSource
+from aspire.source import ArrayImageSource, MeanImage
 from aspire.source.simulation import Simulation
 from aspire.utils import utest_tolerance
 from aspire.utils.coor_trans import grid_2d, grid_3d
@@ -161,3 +161,43 @@ class PreprocessPLTestCase(TestCase):
 
         # all images should be the same after inverting contrast
         self.assertTrue(np.allclose(imgs1_rc.asnumpy(), imgs2_rc.asnumpy()))
+
+    def testSharedAccumulation(self):
+        # Statistics gathered in one shared pass match those of separate passes
+        white_acc = WhiteNoiseEstimator.make_accumulator(self.sim)
+        aniso_acc = AnisotropicNoiseEstimator.make_accumulator(self.sim)
+        mean_acc = MeanImage(self.L)
+        self.sim.accumulate([white_acc, aniso_acc, mean_acc], batch_size=50)
+        self.assertEqual(mean_acc.n, self.n)
+
+        self.assertTrue(
+            np.allclose(
+                WhiteNoiseEstimator(self.sim, accumulator=white_acc).estimate(),
+                WhiteNoiseEstimator(self.sim).estimate(),
+            )
+        )
+        self.assertTrue(
+            np.allclose(
+                AnisotropicNoiseEstimator(
+                    self.sim, accumulator=aniso_acc
+                ).filter.xfer_fn_array,
+                AnisotropicNoiseEstimator(self.sim).filter.xfer_fn_array,
+            )
+        )
+        self.assertTrue(
+            np.allclose(
+                mean_acc.mean,
+                np.mean(self.imgs_org.asnumpy(), axis=0),
+                atol=utest_tolerance(self.dtype),
+            )
+        )
+
+        sim2 = ArrayImageSource(-self.imgs_org)
+        sim2.invert_contrast(mean_image=-mean_acc.mean)
+        self.sim.invert_contrast()
+        self.assertTrue(
+            np.allclose(
+                self.sim.images(start=0, num=self.n).asnumpy(),
+                sim2.images(start=0, num=self.n).asnumpy(),
+            )
+        )
@@ -1,12 +1,16 @@
+import itertools
 import os.path
 import tempfile
 from unittest import TestCase
 
+import mrcfile
 import numpy as np
 
+from aspire.image.xform import Xform
 from aspire.operators import IdentityFilter, RadialCTFFilter
 from aspire.source.relion import RelionSource
 from aspire.source.simulation import Simulation
+from aspire.utils import Rotation
 from aspire.utils.types import utest_tolerance
 from aspire.volume import Volume
 
@@ -97,6 +101,37 @@ class SimTestCase(TestCase):
             )
         )
 
+    def testSimulationIterBatches(self):
+        images = self.sim.images(0, 512).asnumpy()
+        for prefetch, workers in ((0, 1), (2, 1), (3, 2)):
+            batches = list(
+                self.sim.iter_batches(
+                    batch_size=100, num=512, prefetch=prefetch, workers=workers
+                )
+            )
+            self.assertEqual([len(im.data) for im in batches], [100] * 5 + [12])
+            self.assertTrue(
+                np.allclose(np.concatenate([im.data for im in batches]), images)
+            )
+
+    def testSimulationCacheDisk(self):
+        self.sim.downsample(6)
+        images = self.sim.images(0, 1024).asnumpy()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.sim.cache(mode="disk", scratch_dir=tmpdir, batch_size=100)
+            self.assertEqual(len(self.sim.generation_pipeline.xforms), 0)
+
+            cached = self.sim.images(100, 200)
+            self.assertEqual(cached.dtype, np.float32)
+            self.assertTrue(np.allclose(cached.asnumpy(), images[100:300]))
+            # Cached images are read-only views on the scratch file
+            with self.assertRaises(ValueError):
+                cached[0, 0, 0] = 0
+
+            self.sim.cache(mode="memory")
+            self.assertTrue(np.allclose(self.sim.images(0, 1024).asnumpy(), images))
+            self.assertIsNone(self.sim._cache_file)
+
     def testSimulationImagesShape(self):
         # The 'images' method should be tolerant of bounds - here we ask for 1000 images starting at index 1000,
         # so we'll get back 25 images in return instead
@@ -489,3 +524,140 @@ class SimTestCase(TestCase):
             imgs_sav = relion_src.images(start=0, num=1024)
             # Compare original images with saved images
             self.assertTrue(np.allclose(imgs_org.asnumpy(), imgs_sav.asnumpy()))
+
+    def testSimulationSaveResume(self):
+        class FailingXform(Xform):
+            """Fails on images from index `fail_from` onwards, and records the indices it sees."""
+
+            def __init__(self):
+                super().__init__()
+                self.fail_from = None
+                self.seen = []
+
+            def _forward(self, im, indices):
+                if self.fail_from is not None and indices.max() >= self.fail_from:
+                    raise RuntimeError("Interrupted")
+                self.seen.extend(indices)
+                return im
+
+        imgs_org = self.sim.images(start=0, num=1024).asnumpy()
+        xform = FailingXform()
+        self.sim.generation_pipeline.add_xform(xform)
+
+        # Interrupted after some batches are saved, and before the first one is
+        for save_mode, fail_from in itertools.product(("single", None), (300, 0)):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                star_filepath = os.path.join(tmpdir, "save_test.star")
+                xform.fail_from = fail_from
+                with self.assertRaises(RuntimeError):
+                    self.sim.save(star_filepath, batch_size=100, save_mode=save_mode)
+                self.assertTrue(os.path.exists(f"{star_filepath}.checkpoint"))
+
+                # Only the batches that were not saved are computed again
+                xform.fail_from = None
+                xform.seen = []
+                self.sim.save(
+                    star_filepath, batch_size=100, save_mode=save_mode, resume=True
+                )
+                self.assertEqual(sorted(xform.seen), list(range(fail_from, 1024)))
+                self.assertFalse(os.path.exists(f"{star_filepath}.checkpoint"))
+
+                relion_src = RelionSource(star_filepath, tmpdir, max_rows=1024)
+                imgs_sav = relion_src.images(start=0, num=1024)
+                self.assertTrue(np.allclose(imgs_org, imgs_sav.asnumpy()))
+
+                # Without a checkpoint, there is nothing to resume and existing files are kept
+                for _ in range(2):
+                    with self.assertRaises(ValueError):
+                        self.sim.save(
+                            star_filepath,
+                            batch_size=100,
+                            save_mode=save_mode,
+                            resume=True,
+                        )
+                    self.assertFalse(os.path.exists(f"{star_filepath}.checkpoint"))
+
+    def testSimulationSaveFloat16(self):
+        imgs_org = self.sim.images(start=0, num=1024).asnumpy()
+        # Relative precision of float16 is about 1e-3
+        atol = 1e-3 * np.max(np.abs(imgs_org))
+
+        for save_mode in ("single", None):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                star_filepath = os.path.join(tmpdir, "save_test.star")
+                self.sim.save(
+                    star_filepath, batch_size=512, save_mode=save_mode, dtype="float16"
+                )
+                mrcs_filepath = os.path.join(tmpdir, "save_test_0_1023.mrcs")
+                if save_mode == "single":
+                    with mrcfile.open(mrcs_filepath) as mrc:
+                        self.assertEqual(mrc.header.mode, 12)
+                        self.assertTrue(
+                            np.isclose(mrc.header.dmean, np.mean(imgs_org), atol=atol)
+                        )
+                        self.assertTrue(
+                            np.isclose(mrc.header.rms, np.std(imgs_org), rtol=1e-3)
+                        )
+
+                # Images are read back in single precision
+                relion_src = RelionSource(star_filepath, tmpdir, max_rows=1024)
+                self.assertEqual(relion_src.dtype, np.float32)
+                imgs_sav = relion_src.images(start=0, num=1024).asnumpy()
+                self.assertEqual(imgs_sav.dtype, np.float32)
+                self.assertTrue(np.allclose(imgs_org, imgs_sav, atol=atol))
+
+                relion_src.downsample(4)
+                self.assertEqual(relion_src.images(0, 16).dtype, np.float32)
+
+    def testHotMetadata(self):
+        rots = self.sim.rots
+        # The same read-only array is returned until the metadata changes
+        self.assertIs(self.sim.rots, rots)
+        self.assertFalse(rots.flags.writeable)
+        # Both agree with the angle columns, up to the range of Euler angles
+        expected = Rotation.from_euler(
+            np.deg2rad(
+                self.sim.get_metadata(["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"])
+            )
+        )
+        self.assertTrue(np.allclose(self.sim.angles, expected.angles, atol=1e-5))
+        self.assertTrue(np.allclose(rots, expected.matrices, atol=1e-5))
+
+        offsets = np.random.randn(self.sim.n, 2)
+        self.sim.set_metadata(["_rlnOriginX", "_rlnOriginY"], offsets)
+        self.assertTrue(np.allclose(self.sim.offsets, offsets))
+        self.assertIs(self.sim.rots, rots)
+
+        self.sim.rots = rots[::-1]
+        self.assertTrue(np.allclose(self.sim.rots, rots[::-1], atol=1e-5))
+        self.sim.angles = self.sim.angles
+        self.assertTrue(np.allclose(self.sim.rots, rots[::-1], atol=1e-5))
+
+        # Setting the angle columns directly refreshes both arrays
+        self.sim.set_metadata(
+            ["_rlnAngleRot", "_rlnAngleTilt", "_rlnAnglePsi"],
+            np.rad2deg(expected.angles),
+        )
+        self.assertTrue(np.allclose(self.sim.angles, expected.angles, atol=1e-5))
+        self.assertTrue(np.allclose(self.sim.rots, rots, atol=1e-5))
+
+    def testEvalFilterGrid(self):
+        grid = self.sim.eval_filter_grid(8, power=2)
+        self.assertEqual(grid.shape, (8, 8, 1024))
+        # One grid per filter, not per image
+        self.assertEqual(grid.grids.shape, (8, 8, 7))
+
+        indices = np.arange(100, 140)
+        weights = grid[:, :, indices]
+        self.assertEqual(weights.shape, (8, 8, 40))
+        for j, i in enumerate(indices):
+            filt = self.sim.unique_filters[self.sim.filter_indices[i]]
+            self.assertTrue(np.allclose(weights[:, :, j], filt.evaluate_grid(8) ** 2))
+
+        # Slices are copies, free to be modified
+        weights[0] = 0
+        self.assertTrue(np.allclose(grid[:, :, indices][1:], weights[1:]))
+        self.assertFalse(np.allclose(grid[0, :, indices], 0))
+        self.assertTrue(
+            np.array_equal(grid.asnumpy()[:, :, indices], grid[:, :, indices])
+        )
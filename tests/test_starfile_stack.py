@@ -1,13 +1,16 @@
 import os
 import os.path
+import tempfile
 from unittest import TestCase
 
 import importlib_resources
 import numpy as np
 
 import tests.saved_test_data
+from aspire.config import config_override
 from aspire.image import Image
-from aspire.operators import ScalarFilter
+from aspire.image.xform import FilterXform, IndexedXform
+from aspire.operators import BatchCTFFilter, LambdaFilter, ScalarFilter
 from aspire.source.relion import RelionSource
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "saved_test_data")
@@ -41,6 +44,8 @@ class StarFileTestCase(TestCase):
                     )
                     should_delete_file = True
 
+            self.starfile_path = path
+            self.data_folder = temp_folder_path
             self.src = RelionSource(path, data_folder=temp_folder_path, max_rows=12)
             super(StarFileTestCase, self).run(result)
 
@@ -87,6 +92,45 @@ class StarFileTestCase(TestCase):
         first_image = self.src.images(0, 1)[0]
         self.assertEqual(first_image.shape, (16, 16))
 
+    def testImageDownsampleOnLoad(self):
+        images = self.src.images(0, 12).downsample(16).asnumpy()
+        with config_override({"starfile.load_chunk_size": 5}):
+            self.src.downsample(16)
+            self.assertEqual(len(self.src.generation_pipeline.xforms), 0)
+            self.assertTrue(np.allclose(self.src.images(0, 12).asnumpy(), images))
+
+        # Once images are transformed, further downsampling happens in the pipeline
+        self.src.downsample(8)
+        self.assertEqual(len(self.src.generation_pipeline.xforms), 1)
+        self.assertEqual(self.src.images(0, 12).shape, (12, 8, 8))
+
+    def testPhaseFlip(self):
+        self.assertIsInstance(self.src.unique_filters, BatchCTFFilter)
+        self.src.downsample(16)
+        images = self.src.images(0, 12)
+
+        # The CTFs of a batch are evaluated together, with the same result as one by one
+        filters = list(self.src.unique_filters)
+        phase_flip = IndexedXform(
+            [FilterXform(LambdaFilter(f, np.sign)) for f in filters],
+            self.src.filter_indices,
+        )
+        expected = phase_flip.forward(images, np.arange(12)).asnumpy()
+        self.src.phase_flip()
+        self.assertTrue(
+            np.allclose(self.src.images(0, 12).asnumpy(), expected, atol=1e-6)
+        )
+
+        expected = np.stack(
+            [
+                Image(images[i]).filter(filters[k])[0]
+                for i, k in enumerate(self.src.filter_indices)
+            ]
+        )
+        self.assertTrue(
+            np.allclose(self.src.eval_filters(images).asnumpy(), expected, atol=1e-6)
+        )
+
     def testImageDownsampleAndWhiten(self):
         self.src.downsample(16)
         self.src.whiten(noise_filter=ScalarFilter(dim=2, value=0.02450909546680349))
@@ -100,3 +144,32 @@ class StarFileTestCase(TestCase):
                 atol=1e-6,
             )
         )
+
+    def testMetadataCache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # The first construction populates the cache ..
+            src1 = RelionSource(
+                self.starfile_path,
+                data_folder=self.data_folder,
+                max_rows=12,
+                metadata_cache=tmpdir,
+            )
+            self.assertEqual(1, len(os.listdir(tmpdir)))
+            # .. which the second construction reads back.
+            src2 = RelionSource(
+                self.starfile_path,
+                data_folder=self.data_folder,
+                max_rows=12,
+                metadata_cache=tmpdir,
+            )
+
+        for src in (src1, src2):
+            self.assertEqual(src.n, self.src.n)
+            self.assertEqual(src.L, self.src.L)
+            self.assertEqual(src.dtype, self.src.dtype)
+            self.assertEqual(len(src.unique_filters), len(self.src.unique_filters))
+            self.assertTrue(np.all(src.filter_indices == self.src.filter_indices))
+            self.assertTrue(src._metadata.equals(self.src._metadata))
+            self.assertTrue(
+                np.allclose(src.images(0, 3).asnumpy(), self.src.images(0, 3).asnumpy())
+            )
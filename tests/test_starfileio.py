@@ -110,6 +110,25 @@ class StarFileTestCase(TestCase):
         # Missing values in a loop default to ''
         self.assertEqual("", df[df["_name"] == "Earth"].iloc[0]["_discovered_year"])
 
+    def testColumnTypes(self):
+        # Loop columns may be typed while parsing
+        with importlib_resources.path(tests.saved_test_data, "sample.star") as path:
+            starfile = StarFile(
+                path, column_types={"_diameter_km": int, "_gravity": float}
+            )
+        df = starfile["planetary"][0]
+        self.assertEqual(np.int64, df["_diameter_km"].dtype)
+        self.assertEqual(np.float64, df["_gravity"].dtype)
+        self.assertEqual(12756, df[df["_name"] == "Earth"].iloc[0]["_diameter_km"])
+        # Columns not found in column_types are still read as strings
+        self.assertEqual("79", df[df["_name"] == "Jupiter"].iloc[0]["_num_moons"])
+        # Parsed values match the untyped parse
+        self.assertTrue(
+            np.allclose(
+                df["_gravity"], self.starfile["planetary"][0]["_gravity"].astype(float)
+            )
+        )
+
     def testSave(self):
         # Save the StarFile object to disk,
         #   read it back, and check for equality.
@@ -121,3 +140,30 @@ class StarFileTestCase(TestCase):
         self.assertEqual(self.starfile, self.starfile2)
 
         os.remove("sample_saved.star")
+
+    def testSaveTyped(self):
+        # Typed loops round trip through save
+        df = DataFrame(
+            {
+                "_rlnDefocusU": np.linspace(10000, 20000, 5),
+                "_rlnClassNumber": np.arange(1, 6),
+                "_rlnImageName": [f"{i:06}@stack.mrcs" for i in range(1, 6)],
+            }
+        )
+        starfile = StarFile(blocks=[StarFileBlock(loops=[df], name="")])
+        column_types = {"_rlnDefocusU": float, "_rlnClassNumber": int}
+
+        filepath = os.path.join(self.tmpdir, "typed.star")
+        # Use a small chunksize to exercise writing in chunks
+        with open(filepath, "w") as f:
+            starfile.save(f, chunksize=2)
+        df2 = StarFile(filepath, column_types=column_types)[0][0]
+        self.assertTrue((df == df2).all(axis=None))
+
+        # Floats may be written with a fixed number of decimals
+        with open(filepath, "w") as f:
+            starfile.save(f, float_precision=1)
+        with open(filepath, "r") as f:
+            self.assertIn("12500.0 2 000002@stack.mrcs", f.read())
+        df2 = StarFile(filepath, column_types=column_types)[0][0]
+        self.assertTrue(np.allclose(df["_rlnDefocusU"], df2["_rlnDefocusU"]))
@@ -5,7 +5,7 @@ import numpy as np
 from pytest import raises
 
 from aspire import __version__
-from aspire.utils import get_full_version, powerset, utest_tolerance
+from aspire.utils import get_full_version, group_indices, powerset, utest_tolerance
 
 
 class UtilsTestCase(TestCase):
@@ -48,3 +48,11 @@ class UtilsTestCase(TestCase):
         self.assertEqual(1e-5, utest_tolerance(np.float32))
         with raises(TypeError):
             utest_tolerance(np.int)
+
+    def testGroupIndices(self):
+        groups = group_indices(np.array([2, 0, 2, 1, 0, 2]))
+        self.assertEqual([label for label, _ in groups], [0, 1, 2])
+        self.assertEqual(
+            [positions.tolist() for _, positions in groups], [[1, 4], [3], [0, 2, 5]]
+        )
+        self.assertEqual(group_indices(np.array([], dtype=int)), [])